@@ -10,28 +10,47 @@ Ejecutar:
     uvicorn main:app --reload --host 0.0.0.0 --port 8000
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from pathlib import Path
 from loguru import logger
-from typing import Optional, List
+from typing import Optional, List, Dict
 import time
 import json
 import uuid
 import asyncio
 import subprocess
+import os
+import sys
+
+# `python main.py` equivale a `uvicorn main:app --reload`, pero reemplaza el
+# proceso antes de inicializar nada. Si este archivo fuera el __main__ del
+# servidor, los procesos hijos con spawn (lectores de la indexación) lo
+# volverían a ejecutar como __mp_main__: otro modelo de embeddings, otro
+# executor y los runs en curso marcados como interrumpidos.
+if __name__ == "__main__":
+    logger.info("Iniciando DirectOS Backend v9.0 - Agent Mode")
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "main:app", "--reload",
+        "--host", "0.0.0.0", "--port", "8000", "--app-dir", str(Path(__file__).parent)
+    ])
 
 # Importar módulos
 from modules.knowledge import KnowledgeBase
+from modules.index_jobs import IndexJobManager
 from modules.scout import Scout
 from modules.content import ContentManager
 
 # Agent Mode v9.0
-from modules.executor import PipelineExecutor, PipelineRun
-from modules.watchdog_service import WatchdogService, WatchConfig, WATCH_PRESETS
+from modules.executor import PipelineExecutor, PipelineRun, PipelineCycleError, ExecutorBusyError
+from modules.python_pool import PythonWorkerPool
+from modules.ollama_client import OllamaClient
+from modules.event_bus import EventBus
+from modules.pipeline_registry import PipelineRegistry
+from modules.watchdog_service import WatchdogService, WatchConfig, FileEvent, WATCH_PRESETS
 from modules.scheduler import SchedulerService, ScheduledTask, SCHEDULE_PRESETS
 from modules.notifier import NotifierService
 
@@ -65,11 +84,44 @@ scout = Scout()
 content = ContentManager(base_dir=DATA_DIR / "content")
 
 # Agent Mode v9.0
-executor = PipelineExecutor(work_dir=DATA_DIR / "runs")
+event_bus = EventBus(coalesce_interval=0.1)  # Eventos para /ws/agent, en lotes cada 100ms
+executor = PipelineExecutor(
+    work_dir=DATA_DIR / "runs",
+    max_parallel_nodes=4,   # Nodos simultáneos por pipeline
+    max_global_nodes=8,     # Nodos simultáneos entre todos los pipelines
+    max_concurrent_runs=4,  # Runs simultáneos (el resto espera en cola)
+    max_queued_runs=50,     # Runs en cola antes de responder 429
+    retention_days=30,      # Historial de runs en data/runs/runs.db
+    python_pool=PythonWorkerPool(
+        size=2,             # Workers Python precalentados (nodos python con config.warm)
+        preload=[],         # Módulos a importar una vez, p.ej. ["numpy", "sentence_transformers"]
+        max_tasks=200,      # Reciclar el worker tras N nodos...
+        max_rss_mb=2048     # ...o si su memoria supera este umbral
+    ),
+    ollama=OllamaClient(
+        base_url="http://127.0.0.1:11434",
+        max_connections=4,  # Peticiones simultáneas (el servidor las agrupa por modelo)
+        keep_alive="10m"    # Tiempo que ollama mantiene el modelo cargado entre nodos
+    ),
+    event_bus=event_bus
+)
+# Pipelines guardados (los que lanzan schedules y watches por pipeline_id)
+pipelines = PipelineRegistry(DATA_DIR / "agent" / "pipelines.db", compiler=executor.compile_pipeline)
 watchdog = WatchdogService(config_path=DATA_DIR / "agent" / "watches.json")
 scheduler = SchedulerService(config_path=DATA_DIR / "agent" / "schedules.json")
 notifier = NotifierService(config_path=DATA_DIR / "agent" / "notifier.json")
 
+# Eventos de watchdog, scheduler y notifier al bus (los de runs los publica el executor)
+watchdog.on_event = lambda event: event_bus.publish("watchdog", event)
+scheduler.on_event = lambda event: event_bus.publish("scheduler", event, key=f"task:{event['task_id']}")
+notifier.on_notification = lambda n: event_bus.publish("notification", {"event": "notification", **n.to_dict()})
+
+# Indexaciones de la Knowledge Base en background (progreso al bus, topic "index")
+index_jobs = IndexJobManager(
+    knowledge,
+    on_event=lambda event: event_bus.publish("index", event, key=f"index:{event['id']}")
+)
+
 # Configurar logging
 logger.add(DATA_DIR / "logs" / "directos.log", rotation="1 MB")
 
@@ -84,6 +136,10 @@ class SearchQuery(BaseModel):
     query: str
     limit: int = 5
 
+class SearchBatchQuery(BaseModel):
+    queries: List[str]
+    limit: int = 5
+
 class SearchResult(BaseModel):
     text: str
     source: str
@@ -158,6 +214,21 @@ class PipelineExecuteRequest(BaseModel):
     name: str = "Pipeline"
     nodes: List[dict]
     connections: List[dict] = []
+    max_parallel: Optional[int] = None  # Límite de nodos en paralelo para este run
+    priority: int = 0  # Mayor = sale antes de la cola
+    cache: bool = False  # Reutilizar resultados de nodos sin cambios (config.cache por nodo)
+    on_failure: str = "skip-dependents"  # fail-fast | continue | skip-dependents (config.on_failure por nodo)
+
+class PipelineSaveRequest(BaseModel):
+    """Crear o actualizar (nueva versión) un pipeline guardado"""
+    name: str = "Pipeline"
+    nodes: List[dict]
+    connections: List[dict] = []
+    max_parallel: Optional[int] = None
+    priority: int = 0
+    cache: bool = False
+    on_failure: str = "skip-dependents"
+    variables: Dict[str, str] = {}  # Valores por defecto de {nombre} (los disparos pueden sobrescribirlos)
 
 class WatchCreateRequest(BaseModel):
     """Crear un watch de archivos"""
@@ -197,7 +268,7 @@ async def health_check():
             "content": content.get_stats()
         },
         "agent": {
-            "executor": len(executor.runs),
+            "executor": executor.count_runs(),
             "watchdog": watchdog.get_status(),
             "scheduler": scheduler.get_status(),
             "notifier": notifier.get_status()
@@ -264,23 +335,72 @@ async def semantic_search(query: SearchQuery):
     if not knowledge.is_ready():
         raise HTTPException(status_code=503, detail="Knowledge base no inicializada")
 
-    results = knowledge.search(query.query, limit=query.limit)
+    # Embedding y consulta a ChromaDB fuera del event loop
+    results = await asyncio.to_thread(knowledge.search, query.query, limit=query.limit)
     return results
 
+MAX_BATCH_QUERIES = 256  # Queries por petición en /api/search/batch
+
+@app.post("/api/search/batch", response_model=list[list[SearchResult]])
+async def semantic_search_batch(query: SearchBatchQuery):
+    """
+    Varias búsquedas semánticas en una petición (p.ej. lookups RAG de un agente).
+
+    Las queries se embeben en una sola llamada al modelo y se buscan con
+    una sola consulta a ChromaDB. Devuelve una lista de resultados por query.
+    """
+    if not knowledge.is_ready():
+        raise HTTPException(status_code=503, detail="Knowledge base no inicializada")
+    if len(query.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_QUERIES} queries por petición")
+
+    return await asyncio.to_thread(knowledge.search_batch, query.queries, limit=query.limit)
+
 @app.post("/api/index")
-async def index_documents(folder_path: str = None):
-    """Indexar documentos markdown"""
+async def index_documents(folder_path: str = None, batch_size: int = None, force: bool = False):
+    """
+    Indexar documentos markdown en background.
+
+    Responde al momento con el trabajo (id, estado); el progreso se consulta
+    en /api/index/jobs/{job_id} o llega por /ws/agent (topic "index").
+    batch_size: chunks por lote de embeddings; force: re-embeber todo.
+    """
+    if not knowledge.is_ready():
+        raise HTTPException(status_code=503, detail="Knowledge base no inicializada")
+
     # Por defecto, indexar archivos del Desktop relacionados con aprendizaje
     if folder_path is None:
         folder_path = str(Path.home() / "Desktop")
-
-    count = knowledge.index_folder(folder_path)
-    return {"indexed": count, "path": folder_path}
+    if not Path(folder_path).expanduser().is_dir():
+        raise HTTPException(status_code=404, detail=f"Carpeta no existe: {folder_path}")
+
+    job = index_jobs.start(folder_path, batch_size=batch_size, force=force)
+    return {"job_id": job.id, "path": folder_path, **job.to_dict()}
+
+@app.get("/api/index/jobs")
+async def list_index_jobs():
+    """Indexaciones recientes y en curso"""
+    return [job.to_dict() for job in index_jobs.list()]
+
+@app.get("/api/index/jobs/{job_id}")
+async def get_index_job(job_id: str):
+    """Estado y progreso de una indexación"""
+    job = index_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Indexación no encontrada")
+    return job.to_dict()
+
+@app.post("/api/index/jobs/{job_id}/cancel")
+async def cancel_index_job(job_id: str):
+    """Cancelar una indexación pendiente o en curso"""
+    if not index_jobs.cancel(job_id):
+        raise HTTPException(status_code=400, detail="No se puede cancelar (no existe o ya terminó)")
+    return {"cancelled": job_id}
 
 @app.get("/api/stats")
 async def knowledge_stats():
     """Estadísticas de la knowledge base"""
-    return knowledge.get_stats()
+    return {**knowledge.get_stats(), "index_jobs": index_jobs.get_stats()}
 
 # =============================================================================
 # ENDPOINTS - SCOUT
@@ -867,6 +987,94 @@ async def discover_directos():
 # ENDPOINTS - AGENT MODE: EXECUTOR
 # =============================================================================
 
+def notify_pipeline_completed(run: PipelineRun):
+    """Callback para notificar al completar un run"""
+    notifier.pipeline_completed(
+        run.pipeline_name,
+        run.status,
+        run.finished_at - run.started_at if run.finished_at else 0,
+        run.id
+    )
+
+async def launch_saved_pipeline(pipeline_id: str, variables: Dict[str, str] = None, trigger: str = "") -> str:
+    """
+    Lanza la versión actual de un pipeline guardado (ya validada y compilada).
+
+    Raises:
+        KeyError: si el pipeline no existe
+        ExecutorBusyError: si la cola está llena
+    """
+    saved = pipelines.get(pipeline_id)
+    if not saved:
+        raise KeyError(pipeline_id)
+    pipeline_def = {
+        **saved.definition,
+        "variables": {**saved.definition.get("variables", {}), **(variables or {})},
+        "pipeline_id": saved.id,
+        "pipeline_version": saved.version,
+        "trigger": trigger
+    }
+    return await executor.execute(
+        pipeline_def,
+        on_complete=notify_pipeline_completed,
+        execution_order=saved.execution_order
+    )
+
+async def run_scheduled_task(task: ScheduledTask):
+    """Handler del scheduler: lanza el pipeline guardado de la tarea"""
+    try:
+        run_id = await launch_saved_pipeline(task.pipeline_id, {"task_id": task.id}, trigger=f"schedule:{task.id}")
+    except KeyError:
+        raise RuntimeError(f"Pipeline '{task.pipeline_id}' no existe")
+    except (ExecutorBusyError, PipelineCycleError) as e:
+        raise RuntimeError(f"Pipeline '{task.pipeline_id}' no lanzado: {e}")
+    logger.info(f"[SCHEDULER] {task.name} → {run_id}")
+
+def on_file_detected(event: FileEvent):
+    """
+    Handler del watchdog: lanza el pipeline guardado del watch con el archivo
+    en {file}, {file_name} y {file_stem}.
+
+    Se llama desde el hilo del watchdog; la ejecución se pasa al event loop.
+    """
+    watch = watchdog.watches.get(event.watch_id)
+    if not watch or not watch.pipeline_id or agent_loop is None:
+        return
+    path = Path(event.path)
+    variables = {"file": str(path), "file_name": path.name, "file_stem": path.stem, "watch_id": watch.id}
+    future = asyncio.run_coroutine_threadsafe(
+        launch_saved_pipeline(watch.pipeline_id, variables, trigger=f"watch:{watch.id}"),
+        agent_loop
+    )
+
+    def log_result(future):
+        try:
+            logger.info(f"[WATCH] {path.name} → {future.result()}")
+        except KeyError:
+            logger.warning(f"[WATCH] {watch.name}: pipeline '{watch.pipeline_id}' no existe")
+        except (ExecutorBusyError, PipelineCycleError) as e:
+            logger.warning(f"[WATCH] {watch.name}: {path.name} no procesado: {e}")
+        except Exception:
+            logger.exception(f"[WATCH] Error lanzando {watch.pipeline_id}")
+
+    future.add_done_callback(log_result)
+
+agent_loop: Optional[asyncio.AbstractEventLoop] = None
+
+@app.on_event("startup")
+async def capture_agent_loop():
+    """El watchdog lanza pipelines desde su hilo: necesita el event loop del servidor"""
+    global agent_loop
+    agent_loop = asyncio.get_running_loop()
+
+@app.on_event("shutdown")
+async def stop_index_jobs():
+    """Cancelar indexaciones en curso: su hilo retrasaría el cierre del servidor"""
+    index_jobs.cancel_all()
+
+scheduler.on_task_run = run_scheduled_task
+watchdog.on_file_detected = on_file_detected
+
 @app.post("/api/agent/execute")
 async def execute_pipeline(request: PipelineExecuteRequest, background_tasks: BackgroundTasks):
     """
@@ -878,30 +1086,52 @@ async def execute_pipeline(request: PipelineExecuteRequest, background_tasks: Ba
     pipeline_def = {
         "name": request.name,
         "nodes": request.nodes,
-        "connections": request.connections
+        "connections": request.connections,
+        "max_parallel": request.max_parallel,
+        "priority": request.priority,
+        "cache": request.cache,
+        "on_failure": request.on_failure
     }
 
-    # Callback para notificar al completar
-    def on_complete(run: PipelineRun):
-        notifier.pipeline_completed(
-            run.pipeline_name,
-            run.status,
-            run.finished_at - run.started_at if run.finished_at else 0,
-            run.id
+    try:
+        run_id = await executor.execute(pipeline_def, on_complete=notify_pipeline_completed)
+    except PipelineCycleError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": str(e), "cycle": e.cycle}
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
 
-    run_id = await executor.execute(pipeline_def, on_complete=on_complete)
-
+    queued = executor.runs[run_id].status == "queued"
     return {
         "run_id": run_id,
-        "status": "started",
-        "message": f"Pipeline '{request.name}' iniciado"
+        "status": "queued" if queued else "started",
+        "message": f"Pipeline '{request.name}' {'en cola' if queued else 'iniciado'}"
     }
 
 @app.get("/api/agent/runs")
-async def get_pipeline_runs(limit: int = 10):
-    """Listar ejecuciones de pipelines"""
-    return {"runs": executor.get_runs(limit)}
+async def get_pipeline_runs(
+    limit: int = 10,
+    offset: int = 0,
+    status: Optional[str] = None,
+    pipeline: Optional[str] = None
+):
+    """Listar ejecuciones de pipelines (paginado, filtrable por estado y nombre)"""
+    limit = max(1, min(limit, 200))
+    return {
+        "runs": executor.get_runs(limit, offset, status=status, pipeline_name=pipeline),
+        "total": executor.count_runs(status=status, pipeline_name=pipeline),
+        "limit": limit,
+        "offset": offset
+    }
+
+@app.get("/api/agent/stats/tools")
+async def get_tool_stats(days: Optional[float] = None):
+    """CPU, memoria, I/O y duración agregados por tool (para ajustar límites de concurrencia)"""
+    return {"tools": executor.get_tool_stats(days), "days": days}
 
 @app.get("/api/agent/runs/{run_id}")
 async def get_pipeline_run(run_id: str):
@@ -911,6 +1141,26 @@ async def get_pipeline_run(run_id: str):
         raise HTTPException(status_code=404, detail=f"Run '{run_id}' no encontrado")
     return run
 
+@app.get("/api/agent/runs/{run_id}/stream")
+async def stream_pipeline_run(run_id: str):
+    """
+    Stream del output de una ejecución (Server-Sent Events).
+
+    Eventos: log (línea de stdout/stderr), node (nodo terminado), end (run terminado)
+    """
+    if not executor.get_run(run_id):
+        raise HTTPException(status_code=404, detail=f"Run '{run_id}' no encontrado")
+
+    async def event_stream():
+        async for event in executor.stream_run(run_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/agent/runs/{run_id}/cancel")
 async def cancel_pipeline_run(run_id: str):
     """Cancelar una ejecución en progreso"""
@@ -919,6 +1169,163 @@ async def cancel_pipeline_run(run_id: str):
         raise HTTPException(status_code=400, detail="No se puede cancelar (no existe o ya terminó)")
     return {"cancelled": run_id}
 
+@app.post("/api/agent/runs/{run_id}/resume")
+async def resume_pipeline_run(run_id: str):
+    """
+    Retomar un run interrumpido (p.ej. por un reinicio), fallido o cancelado.
+
+    Los nodos completados con sus artefactos intactos no se repiten.
+    """
+    try:
+        resumed = executor.resume_run(run_id, on_complete=notify_pipeline_completed)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    if not resumed:
+        raise HTTPException(status_code=404, detail="Run no encontrado")
+
+    run = executor.runs[run_id]
+    return {
+        "run_id": run_id,
+        "status": run.status,
+        "reused_nodes": [n.id for n in run.nodes if n.resumed]
+    }
+
+@app.websocket("/ws/agent")
+async def agent_events_ws(websocket: WebSocket, topics: Optional[str] = None):
+    """
+    Eventos del Agent Mode en tiempo real (sustituye al polling de /api/agent/runs).
+
+    Al conectar envía un snapshot de los runs activos; después, lotes de
+    eventos delta cada ~100ms: {"type": "batch", "events": [...]}.
+    topics: lista separada por comas (run, run.log, watchdog, scheduler,
+    notification, index); por defecto todos salvo run.log.
+    """
+    await websocket.accept()
+    subscription = event_bus.subscribe(set(topics.split(",")) if topics else None)
+
+    async def watch_disconnect():
+        # El cliente no envía nada: solo esperamos a que cierre
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            subscription.close()
+
+    receiver = asyncio.create_task(watch_disconnect())
+    try:
+        await websocket.send_text(json.dumps({
+            "type": "snapshot",
+            "runs": [
+                {
+                    "run_id": run.id,
+                    "pipeline_name": run.pipeline_name,
+                    "status": run.status,
+                    "progress": run.progress,
+                    "nodes": {n.id: n.status.value for n in run.nodes}
+                }
+                for run in executor.runs.values() if run.is_active
+            ]
+        }, separators=(",", ":")))
+        async for batch in subscription:
+            await websocket.send_text(json.dumps({"type": "batch", "events": batch}, separators=(",", ":")))
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # Cliente desconectado a mitad de un envío
+    finally:
+        event_bus.unsubscribe(subscription)
+        receiver.cancel()
+
+# =============================================================================
+# ENDPOINTS - AGENT MODE: PIPELINES GUARDADOS
+# =============================================================================
+
+def save_pipeline(request: PipelineSaveRequest, pipeline_id: str = None) -> Dict:
+    try:
+        saved = pipelines.save(request.model_dump(), pipeline_id)
+    except PipelineCycleError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "cycle": e.cycle})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return saved.to_dict()
+
+async def plan_pipeline(pipeline_def: Dict) -> Dict:
+    try:
+        return await asyncio.to_thread(executor.plan_pipeline, pipeline_def)
+    except PipelineCycleError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "cycle": e.cycle})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/agent/pipelines/plan")
+async def plan_pipeline_definition(request: PipelineSaveRequest):
+    """
+    Dry-run de un pipeline: valida el grafo, resuelve el comando de cada nodo
+    sin ejecutarlo, calcula el camino crítico y estima la duración con los
+    tiempos de runs anteriores.
+    """
+    return await plan_pipeline(request.model_dump())
+
+@app.get("/api/agent/pipelines/{pipeline_id}/plan")
+async def plan_saved_pipeline(pipeline_id: str, version: Optional[int] = None):
+    """Dry-run de un pipeline guardado (versión actual o ?version=N)"""
+    saved = pipelines.get(pipeline_id, version)
+    if not saved:
+        raise HTTPException(status_code=404, detail=f"Pipeline '{pipeline_id}' no encontrado")
+    return await plan_pipeline(saved.definition)
+
+@app.get("/api/agent/pipelines")
+async def list_pipelines():
+    """Listar pipelines guardados (versión actual, sin definición)"""
+    return {"pipelines": [p.to_dict(include_definition=False) for p in pipelines.list()]}
+
+@app.post("/api/agent/pipelines")
+async def create_pipeline(request: PipelineSaveRequest):
+    """Guardar un pipeline nuevo (se valida y se compila su orden de ejecución)"""
+    return save_pipeline(request)
+
+@app.get("/api/agent/pipelines/{pipeline_id}")
+async def get_pipeline(pipeline_id: str, version: Optional[int] = None):
+    """Obtener un pipeline guardado (versión actual o ?version=N)"""
+    saved = pipelines.get(pipeline_id, version)
+    if not saved:
+        raise HTTPException(status_code=404, detail=f"Pipeline '{pipeline_id}' no encontrado")
+    return saved.to_dict()
+
+@app.put("/api/agent/pipelines/{pipeline_id}")
+async def update_pipeline(pipeline_id: str, request: PipelineSaveRequest):
+    """Guardar una versión nueva de un pipeline (las anteriores se conservan)"""
+    if not pipelines.get(pipeline_id):
+        raise HTTPException(status_code=404, detail=f"Pipeline '{pipeline_id}' no encontrado")
+    return save_pipeline(request, pipeline_id)
+
+@app.delete("/api/agent/pipelines/{pipeline_id}")
+async def delete_pipeline(pipeline_id: str):
+    """Eliminar un pipeline con todas sus versiones"""
+    if not pipelines.delete(pipeline_id):
+        raise HTTPException(status_code=404, detail=f"Pipeline '{pipeline_id}' no encontrado")
+    return {"deleted": pipeline_id}
+
+@app.get("/api/agent/pipelines/{pipeline_id}/versions")
+async def get_pipeline_versions(pipeline_id: str):
+    """Historial de versiones de un pipeline"""
+    if not pipelines.get(pipeline_id):
+        raise HTTPException(status_code=404, detail=f"Pipeline '{pipeline_id}' no encontrado")
+    return {"pipeline_id": pipeline_id, "versions": pipelines.versions(pipeline_id)}
+
+@app.post("/api/agent/pipelines/{pipeline_id}/run")
+async def run_saved_pipeline(pipeline_id: str, variables: Dict[str, str] = None):
+    """Lanzar la versión actual de un pipeline guardado"""
+    try:
+        run_id = await launch_saved_pipeline(pipeline_id, variables, trigger="api")
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Pipeline '{pipeline_id}' no encontrado")
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return {"run_id": run_id, "status": executor.runs[run_id].status}
+
 # =============================================================================
 # ENDPOINTS - AGENT MODE: WATCHDOG
 # =============================================================================
@@ -1112,8 +1519,15 @@ async def get_agent_status():
     return {
         "executor": {
             "active_runs": len([r for r in executor.runs.values() if r.status == "running"]),
-            "total_runs": len(executor.runs)
+            "total_runs": executor.count_runs(),
+            "queue": executor.get_queue_stats(),
+            "cache": executor.cache.get_stats(),
+            "writer": executor.writer.get_stats(),
+            "event_bus": event_bus.get_stats(),
+            "python_pool": executor.python_pool.get_stats() if executor.python_pool else None,
+            "ollama": executor.ollama.get_stats() if executor.ollama else None
         },
+        "pipelines": pipelines.get_stats(),
         "watchdog": watchdog.get_status(),
         "scheduler": scheduler.get_status(),
         "notifier": notifier.get_status()
@@ -1264,12 +1678,3 @@ async def serve_frontend():
 # Montar archivos estáticos si los hubiera
 if FRONTEND_DIR.exists():
     app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
-
-# =============================================================================
-# MAIN
-# =============================================================================
-
-if __name__ == "__main__":
-    import uvicorn
-    logger.info("Iniciando DirectOS Backend v9.0 - Agent Mode")
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,157 @@
+"""
+Child Process - DirectOS v9.0 Agent Mode
+========================================
+Procesos de los nodos con contabilidad de recursos.
+
+asyncio recoge a sus hijos con waitpid y descarta el rusage. Aquí cada
+hijo se recoge con os.wait4 en un hilo propio (igual que el
+ThreadedChildWatcher de asyncio), así que al terminar se conoce su CPU,
+memoria máxima, I/O de bloque y cambios de contexto, los suyos y los de
+los descendientes que él mismo haya recogido (p.ej. los comandos de un sh).
+
+    process = await spawn_process(["ffmpeg", "-i", "a.wav", "a.mp3"], cwd=run_dir)
+    await process.wait()
+    process.rusage  # {"user_cpu": 1.2, "sys_cpu": 0.1, "max_rss_kb": 52000, ...}
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+
+# Campos de rusage por nodo (CPU en segundos, memoria en KB, I/O en bloques)
+RUSAGE_FIELDS = (
+    "user_cpu", "sys_cpu", "max_rss_kb",
+    "read_blocks", "write_blocks", "voluntary_ctx", "involuntary_ctx"
+)
+
+
+def rusage_dict(ru) -> Dict[str, Union[int, float]]:
+    """resource.struct_rusage (de os.wait4) → dict con RUSAGE_FIELDS"""
+    max_rss = ru.ru_maxrss
+    if sys.platform == "darwin":
+        max_rss //= 1024  # macOS lo da en bytes, Linux en KB
+    return {
+        "user_cpu": round(ru.ru_utime, 4),
+        "sys_cpu": round(ru.ru_stime, 4),
+        "max_rss_kb": max_rss,
+        "read_blocks": ru.ru_inblock,
+        "write_blocks": ru.ru_oublock,
+        "voluntary_ctx": ru.ru_nvcsw,
+        "involuntary_ctx": ru.ru_nivcsw
+    }
+
+
+def merge_rusage(total: Dict, usage: Optional[Dict]) -> Dict:
+    """Acumula usage en total (sumas; max_rss_kb es el máximo)"""
+    if not usage:
+        return total
+    for key in RUSAGE_FIELDS:
+        if key == "max_rss_kb":
+            total[key] = max(total.get(key, 0), usage.get(key, 0))
+        else:
+            total[key] = round(total.get(key, 0) + usage.get(key, 0), 4)
+    return total
+
+
+async def pipe_reader(fd, loop: asyncio.AbstractEventLoop = None) -> asyncio.StreamReader:
+    """StreamReader sobre un fd (o archivo) de lectura"""
+    loop = loop or asyncio.get_running_loop()
+    pipe = os.fdopen(fd, "rb", 0) if isinstance(fd, int) else fd
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader
+
+
+async def pipe_writer(fd, loop: asyncio.AbstractEventLoop = None) -> asyncio.StreamWriter:
+    """StreamWriter sobre un fd (o archivo) de escritura"""
+    loop = loop or asyncio.get_running_loop()
+    pipe = os.fdopen(fd, "wb", 0) if isinstance(fd, int) else fd
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, pipe)
+    return asyncio.StreamWriter(transport, protocol, None, loop)
+
+
+class AccountedProcess:
+    """
+    Hijo recogido con os.wait4.
+
+    Imita la parte de asyncio.subprocess.Process que usa el executor:
+    pid, returncode, stdin/stdout/stderr y wait(); rusage queda
+    disponible cuando el proceso termina.
+    """
+
+    def __init__(
+        self,
+        popen: subprocess.Popen,
+        stdin: Optional[asyncio.StreamWriter],
+        stdout: asyncio.StreamReader,
+        stderr: asyncio.StreamReader
+    ):
+        self.pid = popen.pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self.rusage: Optional[Dict] = None
+        # Mientras viva, Popen no intenta recoger al hijo por su cuenta
+        self._popen = popen
+        self._exited = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=self._reap, args=(loop,), name=f"wait4-{self.pid}", daemon=True).start()
+
+    def _reap(self, loop: asyncio.AbstractEventLoop):
+        try:
+            _, status, ru = os.wait4(self.pid, 0)
+            code, usage = os.waitstatus_to_exitcode(status), rusage_dict(ru)
+        except ChildProcessError:
+            code, usage = 255, None
+        try:
+            loop.call_soon_threadsafe(self._set_exit, code, usage)
+        except RuntimeError:
+            pass  # El loop ya se cerró
+
+    def _set_exit(self, code: int, usage: Optional[Dict]):
+        self.returncode = code
+        self.rusage = usage
+        self._popen.returncode = code
+        self._exited.set()
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        return self.returncode
+
+
+async def spawn_process(
+    cmd: Union[List[str], str],
+    cwd: Path,
+    stdin: bool = False,
+    preexec_fn: Callable[[], None] = None
+) -> AccountedProcess:
+    """
+    Lanza un nodo en su propia sesión (grupo de procesos) con stdout/stderr
+    en pipes. cmd en str se ejecuta con /bin/sh.
+
+    Args:
+        stdin: crear un pipe de stdin (si no, /dev/null)
+        preexec_fn: límites a aplicar en el hijo antes del exec
+    """
+    popen = subprocess.Popen(
+        cmd,
+        shell=isinstance(cmd, str),
+        stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=str(cwd),
+        start_new_session=True,
+        preexec_fn=preexec_fn,
+        bufsize=0
+    )
+    loop = asyncio.get_running_loop()
+    stdout = await pipe_reader(popen.stdout, loop)
+    stderr = await pipe_reader(popen.stderr, loop)
+    writer = await pipe_writer(popen.stdin, loop) if stdin else None
+    return AccountedProcess(popen, writer, stdout, stderr)
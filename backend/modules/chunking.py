@@ -0,0 +1,103 @@
+"""
+Chunking - DirectOS Knowledge Base
+==================================
+Lectura, hash y troceado de archivos para indexar.
+
+Sin dependencias pesadas a propósito: prepare_file se ejecuta en los
+procesos lectores de la indexación (ProcessPoolExecutor con spawn), que
+así arrancan sin importar torch, sentence-transformers ni ChromaDB.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Optional
+
+
+def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> list[str]:
+    """
+    Dividir texto en chunks para mejor indexación.
+
+    Args:
+        text: Texto completo
+        chunk_size: Tamaño aproximado de cada chunk (caracteres)
+        overlap: Solapamiento entre chunks
+
+    Returns:
+        Lista de chunks
+    """
+    # Dividir por párrafos primero
+    paragraphs = re.split(r'\n\n+', text)
+
+    chunks = []
+    current_chunk = ""
+
+    for para in paragraphs:
+        para = para.strip()
+        if not para:
+            continue
+
+        if len(current_chunk) + len(para) < chunk_size:
+            current_chunk += para + "\n\n"
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = para + "\n\n"
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    return chunks
+
+
+def chunk_ids(path: str, count: int) -> list[str]:
+    """
+    Ids estables de los chunks de un archivo: hash de la ruta + índice.
+
+    Dos archivos con el mismo nombre en carpetas distintas no colisionan,
+    y reindexar un archivo sobreescribe sus propios chunks (upsert).
+    """
+    key = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    return [f"{key}_{i}" for i in range(count)]
+
+
+def prepare_file(path: str, entry: Optional[dict] = None, force: bool = False) -> tuple[str, dict]:
+    """
+    Leer y trocear un archivo si cambió respecto a su entrada del manifest.
+
+    Args:
+        path: Ruta absoluta al archivo
+        entry: Entrada del manifest ({"mtime", "size", "hash", "chunk_ids"}) o None
+        force: Trocear aunque no haya cambiado
+
+    Returns:
+        (estado, datos):
+        - "unchanged": {"path", "mtime", "size", "hash"}; hash es None si ni se leyó
+        - "changed":   además name, chunks, ids y old_ids (None si es nuevo)
+        - "error":     {"path", "error"}
+    """
+    file_path = Path(path)
+    try:
+        stat = file_path.stat()
+        result = {"path": path, "mtime": stat.st_mtime, "size": stat.st_size, "hash": None}
+        if entry and not force and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return "unchanged", result
+
+        data = file_path.read_bytes()
+        result["hash"] = hashlib.sha256(data).hexdigest()
+        if entry and not force and entry["hash"] == result["hash"]:
+            # Solo cambió el mtime: no hace falta volver a embeber
+            return "unchanged", result
+
+        chunks = chunk_text(data.decode("utf-8"))
+        return "changed", {
+            **result,
+            "name": file_path.name,
+            "chunks": chunks,
+            "ids": chunk_ids(path, len(chunks)),
+            "old_ids": entry["chunk_ids"] if entry else None
+        }
+
+    except Exception as e:
+        # Sin logger: puede ejecutarse en un proceso lector
+        return "error", {"path": path, "error": str(e)}
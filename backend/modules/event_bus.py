@@ -0,0 +1,147 @@
+"""
+Event Bus - DirectOS v9.0 Agent Mode
+====================================
+Pub/sub en proceso para empujar eventos del Agent Mode a la UI.
+
+Productores: executor (runs y nodos), watchdog, scheduler, notifier e
+indexaciones de la Knowledge Base.
+Consumidores: /ws/agent (un suscriptor por pestaña del navegador).
+
+Cada suscriptor acumula sus eventos pendientes y los recibe en lotes
+cada coalesce_interval. Dentro de un lote, los eventos con la misma
+clave se sustituyen por el último (p.ej. diez actualizaciones de progreso
+del mismo run → una), así una ráfaga no se traduce en N mensajes por
+cliente y un cliente lento nunca frena a los productores.
+
+Topics:
+    run        estado de runs y nodos, progreso
+    run.log    líneas de log y tokens (volumen alto, opt-in)
+    watchdog   archivos detectados
+    scheduler  tareas ejecutadas
+    notification
+    index      progreso de indexaciones de la Knowledge Base
+
+publish() se puede llamar desde cualquier hilo (watchdog, notifier e
+indexaciones publican desde los suyos).
+"""
+
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+
+DEFAULT_TOPICS = {"run", "watchdog", "scheduler", "notification", "index"}
+
+
+class Subscription:
+    """Eventos pendientes de un suscriptor; se itera por lotes"""
+
+    def __init__(self, bus: "EventBus", topics: Optional[Set[str]]):
+        self.topics = topics
+        self._bus = bus
+        self._pending: "OrderedDict[object, Dict]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def _add(self, key, event: Dict):
+        if key in self._pending:
+            # Coalescer: el último valor ocupa el sitio del más reciente
+            del self._pending[key]
+        elif len(self._pending) >= self._bus.max_pending:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = event
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> List[Dict]:
+        while True:
+            await self._ready.wait()
+            if self.closed:
+                raise StopAsyncIteration
+            # Dejar que se acumule la ráfaga antes de enviar
+            await asyncio.sleep(self._bus.coalesce_interval)
+            self._ready.clear()
+            if self.closed:
+                raise StopAsyncIteration
+            if self._pending:
+                batch = list(self._pending.values())
+                self._pending.clear()
+                return batch
+
+
+class EventBus:
+    """
+    Bus de eventos en proceso.
+
+    Uso:
+        bus = EventBus()
+        bus.publish("run", {"event": "progress", "run_id": rid, "progress": 40}, key=f"{rid}:progress")
+
+        sub = bus.subscribe({"run"})
+        async for batch in sub:
+            ...
+        bus.unsubscribe(sub)
+    """
+
+    def __init__(self, coalesce_interval: float = 0.1, max_pending: int = 1000):
+        self.coalesce_interval = coalesce_interval
+        self.max_pending = max_pending
+        self._subscribers: List[Subscription] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = itertools.count()
+        self.published = 0
+
+    def subscribe(self, topics: Optional[Set[str]] = None) -> Subscription:
+        """Nuevo suscriptor (llamar desde el event loop). topics=None → DEFAULT_TOPICS"""
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(self, set(topics) if topics else set(DEFAULT_TOPICS))
+        self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        sub.close()
+        if sub in self._subscribers:
+            self._subscribers.remove(sub)
+
+    def publish(self, topic: str, event: Dict, key: str = None):
+        """
+        Publica un evento. key opcional para coalescer: dentro de un lote
+        solo se entrega el último evento con la misma clave.
+        """
+        if not self._subscribers:
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False  # Llamada desde otro hilo
+        if in_loop:
+            self._dispatch(topic, event, key)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch, topic, event, key)
+        except RuntimeError:
+            pass  # Loop cerrado
+
+    def _dispatch(self, topic: str, event: Dict, key: Optional[str]):
+        self.published += 1
+        message = {"topic": topic, **event}
+        slot = (topic, key) if key is not None else next(self._seq)
+        for sub in self._subscribers:
+            if topic in sub.topics:
+                sub._add(slot, message)
+
+    def get_stats(self) -> Dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in self._subscribers)
+        }
@@ -6,7 +6,7 @@ Ejecuta pipelines diseñados en el canvas como código real.
 Arquitectura:
 1. Recibe definición de pipeline (nodos + conexiones)
 2. Construye grafo de ejecución
-3. Ejecuta cada nodo en orden topológico
+3. Ejecuta en paralelo los nodos cuyas dependencias ya terminaron
 4. Captura output y errores
 5. Notifica progreso
 
@@ -20,19 +20,157 @@ Ejemplo de pipeline:
         {"from": "n1", "to": "n2"}
     ]
 }
+
+Paso de datos por conexión:
+- por defecto, el nodo destino recibe el artefacto del origen en {input}
+  (config.output, outputs[0] o su stdout volcado a {node_id}.out);
+  con "as": "audio" queda también disponible como {audio}
+- "mode": "pipe" conecta stdout→stdin en streaming y ambos nodos corren a la vez
+
+Nodos map (tool "map"): repiten un subgrafo por cada item de una lista
+(config.items, config.glob o las líneas de sus entradas con
+config.from_input) con paralelismo acotado, dentro del mismo run:
+    {"id": "ocr", "tool": "map", "config": {
+        "glob": "inbox/*.pdf", "parallel": 4,
+        "nodes": [{"id": "txt", "tool": "bash", "config": {"command": "pdftotext {item} {item_stem}.txt"}}],
+        "connections": []
+    }}
 """
 
-import subprocess
 import asyncio
+import heapq
+import itertools
 import json
+import os
+import re
+import shlex
+import shutil
+import signal
 import time
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional, Callable
+from collections import Counter, OrderedDict, deque
+from typing import Dict, List, Optional, Callable, Set, Tuple, Union
 from dataclasses import dataclass, field
 from enum import Enum
 from loguru import logger
 
+try:
+    import resource  # Solo Unix: límites del proceso hijo
+except ImportError:
+    resource = None
+
+from modules.node_cache import NodeCache
+from modules.child_process import spawn_process, merge_rusage
+from modules.python_pool import PythonWorkerPool
+from modules.ollama_client import OllamaClient, OllamaError
+from modules.run_store import RunStore
+from modules.run_writer import RunWriter
+from modules.event_bus import EventBus
+
+
+class PipelineCycleError(ValueError):
+    """Las conexiones del pipeline forman un ciclo"""
+
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+        path = " -> ".join(cycle + cycle[:1])
+        super().__init__(f"Ciclo detectado en pipeline: {path}")
+
+
+class ExecutorBusyError(RuntimeError):
+    """La cola de runs está llena; el cliente debe reintentar más tarde"""
+
+
+# Límites por defecto de cada nodo (None = sin límite)
+#   timeout:          segundos de reloj antes de matar el nodo
+#   cpu_seconds:      RLIMIT_CPU (SIGXCPU al superarlo)
+#   memory_mb:        RLIMIT_AS, espacio de direcciones (Linux; macOS no lo aplica)
+#   file_size_mb:     RLIMIT_FSIZE, tamaño máximo de archivo que puede escribir
+#   nice:             prioridad de CPU del hijo (0-19)
+#   max_output_bytes: stdout+stderr leídos antes de matar el nodo
+DEFAULT_LIMITS = {
+    "timeout": 300,
+    "cpu_seconds": None,
+    "memory_mb": None,
+    "file_size_mb": None,
+    "nice": 0,
+    "max_output_bytes": 50 * 1024 * 1024,
+}
+
+# Ajustes por tool sobre DEFAULT_LIMITS (config del nodo tiene prioridad)
+TOOL_LIMITS = {
+    "ffmpeg": {"timeout": 1800, "nice": 10},
+    "whisper": {"timeout": 3600, "nice": 10},
+    "ollama": {"timeout": 600, "nice": 5},
+    "sqlite": {"timeout": 120},
+}
+
+
+def _rlimits(limits: Dict) -> List[Tuple[int, Tuple[int, int]]]:
+    """rlimits a aplicar a un nodo: [(recurso, (soft, hard))]"""
+    if resource is None:
+        return []
+    rlimits = []
+    if limits["cpu_seconds"]:
+        soft = int(limits["cpu_seconds"])
+        # El hard limit algo por encima: primero SIGXCPU, luego SIGKILL
+        rlimits.append((resource.RLIMIT_CPU, (soft, soft + 5)))
+    if limits["memory_mb"]:
+        size = int(limits["memory_mb"]) * 1024 * 1024
+        rlimits.append((resource.RLIMIT_AS, (size, size)))
+    if limits["file_size_mb"]:
+        size = int(limits["file_size_mb"]) * 1024 * 1024
+        rlimits.append((resource.RLIMIT_FSIZE, (size, size)))
+    return rlimits
+
+
+def _child_limits(limits: Dict) -> Callable[[], None]:
+    """Función que aplica nice y rlimits al proceso actual (en el hijo, antes del exec)"""
+    def apply():
+        if limits["nice"]:
+            os.nice(int(limits["nice"]))
+        for res, values in _rlimits(limits):
+            resource.setrlimit(res, values)
+    return apply
+
+
+def _spawn_limits(limits: Dict) -> Optional[Callable[[], None]]:
+    """
+    preexec_fn para spawn_process, o None si el nodo no tiene rlimits.
+
+    preexec_fn obliga a Popen a ejecutar Python entre fork y exec, así que
+    solo se usa cuando hay rlimits: aplicarlos después (prlimit) llegaría
+    tarde a los hijos que un sh crea nada más arrancar. nice no lo necesita
+    (ver _apply_nice).
+    """
+    rlimits = _rlimits(limits)
+    if not rlimits:
+        return None
+
+    def apply():
+        for res, values in rlimits:
+            resource.setrlimit(res, values)
+    return apply
+
+
+def _apply_nice(pid: int, limits: Dict):
+    """Baja la prioridad de un nodo ya lanzado: todo su grupo de procesos, hijos incluidos"""
+    if not limits["nice"]:
+        return
+    try:
+        os.setpriority(os.PRIO_PGRP, pid, int(limits["nice"]))
+    except OSError as e:
+        # El nodo ya terminó: no es un error del nodo
+        logger.debug(f"No se pudo aplicar nice al proceso {pid}: {e}")
+
+
+# Qué hacer con el resto del DAG cuando un nodo falla
+FAILURE_POLICIES = ("fail-fast", "continue", "skip-dependents")
+
+# Líneas de stdout/stderr que se conservan en memoria por nodo (el log completo va a disco)
+OUTPUT_TAIL_LINES = 200
+
 
 class NodeStatus(Enum):
     PENDING = "pending"
@@ -49,10 +187,28 @@ class ExecutionNode:
     tool: str
     config: Dict = field(default_factory=dict)
     status: NodeStatus = NodeStatus.PENDING
-    output: str = ""
-    error: str = ""
     started_at: float = 0
     finished_at: float = 0
+    cached: bool = False  # Resultado reutilizado de la caché de nodos
+    resumed: bool = False  # Resultado reutilizado del checkpoint al retomar el run
+    attempts: int = 0
+    output_bytes: int = 0  # stdout+stderr leídos en el intento actual
+    limit_exceeded: str = ""  # Límite que provocó que se matara el nodo
+    parent: str = ""  # Nodo map que lo generó para uno de sus items
+    # CPU, memoria e I/O de sus procesos (ver child_process.RUSAGE_FIELDS), sumando reintentos
+    rusage: Dict = field(default_factory=dict)
+    items: Dict = field(default_factory=dict)  # Nodos map: resumen por estado de sus items
+    # Ring buffers con las últimas líneas de stdout/stderr
+    output_tail: deque = field(default_factory=lambda: deque(maxlen=OUTPUT_TAIL_LINES), repr=False)
+    error_tail: deque = field(default_factory=lambda: deque(maxlen=OUTPUT_TAIL_LINES), repr=False)
+
+    @property
+    def output(self) -> str:
+        return "".join(self.output_tail)
+
+    @property
+    def error(self) -> str:
+        return "".join(self.error_tail)
 
     @property
     def duration(self) -> float:
@@ -61,27 +217,63 @@ class ExecutionNode:
         return 0
 
 
+@dataclass
+class NodeIO:
+    """
+    Conexión de datos de un nodo con sus vecinos durante una ejecución.
+
+    stdin/stdout: colas de bytes hacia/desde nodos unidos por pipe (None = EOF)
+    stdout_file:  archivo donde volcar el stdout crudo para nodos posteriores
+    variables:    valores de {input}, {inputs} (lista) y artefactos con nombre
+    upstream_files: artefactos recibidos (entran en la clave de caché)
+    """
+    stdin: Optional[asyncio.Queue] = None
+    stdout: Optional[asyncio.Queue] = None
+    stdout_file: str = ""
+    variables: Dict[str, Union[str, List[str]]] = field(default_factory=dict)
+    upstream_files: List[str] = field(default_factory=list)
+
+    @property
+    def piped(self) -> bool:
+        return self.stdin is not None or self.stdout is not None
+
+
 @dataclass
 class PipelineRun:
     """Representa una ejecución de pipeline"""
     id: str
     pipeline_name: str
     nodes: List[ExecutionNode]
-    status: str = "pending"  # pending, running, success, error, cancelled
+    status: str = "pending"  # pending, queued, running, success, error, cancelled, interrupted
     started_at: float = 0
     finished_at: float = 0
     current_node: str = ""
     progress: int = 0  # 0-100
+    connections: List[Dict] = field(default_factory=list)
+    max_parallel: int = 0  # 0 = usar el límite por defecto del executor
+    priority: int = 0  # Mayor = sale antes de la cola
+    cache: bool = False  # Caché de nodos activada por defecto en este run
+    on_failure: str = "skip-dependents"  # Política por defecto (ver FAILURE_POLICIES)
+    created_at: float = field(default_factory=time.time)
+    resumes: int = 0  # Veces que se ha retomado desde su checkpoint
+    variables: Dict[str, str] = field(default_factory=dict)  # Disponibles como {nombre} en todos los nodos
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("pending", "queued", "running")
 
     def to_dict(self) -> Dict:
         return {
             "id": self.id,
             "pipeline_name": self.pipeline_name,
             "status": self.status,
+            "created_at": self.created_at,
             "started_at": self.started_at,
             "finished_at": self.finished_at,
             "current_node": self.current_node,
             "progress": self.progress,
+            "priority": self.priority,
+            "resumes": self.resumes,
             "duration": self.finished_at - self.started_at if self.finished_at else 0,
             "nodes": [
                 {
@@ -90,7 +282,14 @@ class PipelineRun:
                     "status": n.status.value,
                     "output": n.output[-500:] if n.output else "",  # Últimos 500 chars
                     "error": n.error,
-                    "duration": n.duration
+                    "started_at": n.started_at,
+                    "finished_at": n.finished_at,
+                    "duration": n.duration,
+                    "cached": n.cached,
+                    "resumed": n.resumed,
+                    "attempts": n.attempts,
+                    "rusage": n.rusage or None,
+                    **({"items": n.items} if n.items else {})
                 }
                 for n in self.nodes
             ]
@@ -107,99 +306,698 @@ class PipelineExecutor:
         status = executor.get_run(run_id)
     """
 
-    # Mapeo de herramientas a comandos
+    # Mapeo de herramientas a comandos (argv, se ejecutan sin shell).
+    # Cada argumento se renderiza por separado, así que un prompt con comillas
+    # llega intacto. Un argumento que es solo "{args}" se expande a varios
+    # (config.args, str o lista; opcional).
     TOOL_COMMANDS = {
-        "python": "python3 {script}",
-        "nodejs": "node {script}",
-        "bash": "bash {script}",
-        "sqlite": "sqlite3 {db} < {script}",
-        "ffmpeg": "ffmpeg {args}",
-        "whisper": "whisper {input} --model {model} --output_dir {output}",
-        "ollama": "ollama run {model} '{prompt}'",
+        "python": ["python3", "{script}", "{args}"],
+        "nodejs": ["node", "{script}", "{args}"],
+        "bash": ["bash", "{script}", "{args}"],
+        "sqlite": ["sqlite3", "{db}", '.read "{script}"'],
+        "ffmpeg": ["ffmpeg", "{args}"],
+        "whisper": ["whisper", "{input}", "--model", "{model}", "--output_dir", "{output}"],
+        "ollama": ["ollama", "run", "{model}", "{prompt}"],
     }
 
-    def __init__(self, work_dir: Path = None):
+    # Lectura incremental de stdout/stderr
+    STREAM_CHUNK_SIZE = 64 * 1024
+    MAX_LINE_BYTES = 16 * 1024  # Líneas más largas se parten
+    SUBSCRIBER_QUEUE_SIZE = 1000
+    # Segundos sin eventos tras los que stream_run comprueba si el run ya terminó
+    SUBSCRIBER_IDLE_TIMEOUT = 5
+    # Segundos entre SIGTERM y SIGKILL al cancelar un nodo
+    KILL_GRACE_SECONDS = 5
+    # Tools cuyo script puede leer stdin (además de cualquier config.command)
+    STDIN_TOOLS = {"python", "nodejs", "bash", "ollama"}
+    # Trozos de stdout en vuelo entre dos nodos unidos por pipe (backpressure)
+    PIPE_QUEUE_CHUNKS = 16
+    # Reintentos: backoff inicial por defecto y tope
+    DEFAULT_RETRY_BACKOFF = 1.0
+    MAX_RETRY_BACKOFF = 60.0
+    # Runs terminados que se mantienen en memoria además de los activos
+    HOT_FINISHED_RUNS = 20
+    # Cada cuánto se aplica la retención del historial
+    PRUNE_INTERVAL_SECONDS = 3600
+
+    def __init__(
+        self,
+        work_dir: Path = None,
+        max_parallel_nodes: int = 4,
+        max_global_nodes: int = 8,
+        max_concurrent_runs: int = 4,
+        max_queued_runs: int = 50,
+        pipeline_limits: Dict[str, int] = None,
+        cache_max_bytes: int = 1024 ** 3,
+        retention_days: int = 30,
+        python_pool: Optional[PythonWorkerPool] = None,
+        ollama: Optional[OllamaClient] = None,
+        event_bus: Optional[EventBus] = None
+    ):
         self.work_dir = Path(work_dir) if work_dir else Path.home() / ".directos" / "runs"
         self.work_dir.mkdir(parents=True, exist_ok=True)
-        self.runs: Dict[str, PipelineRun] = {}
-        self.active_processes: Dict[str, subprocess.Popen] = {}
+        # Admisión de runs: cuántos a la vez, cuántos en espera y límite por nombre de pipeline
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_queued_runs = max_queued_runs
+        self.pipeline_limits: Dict[str, int] = dict(pipeline_limits or {})
+        self._queue: List[Tuple[int, int, str]] = []  # heap de (-priority, seq, run_id)
+        self._queued: Dict[str, Tuple] = {}  # run_id -> argumentos de _execute_pipeline
+        self._queue_seq = itertools.count()
+        self._active_by_pipeline: Counter = Counter()
+        self._rejected_runs = 0
+        # Caché de resultados de nodos (opt-in por nodo o por pipeline)
+        self.cache = NodeCache(self.work_dir / "_cache", max_bytes=cache_max_bytes)
+        # Workers Python precalentados para nodos python con config.warm
+        self.python_pool = python_pool
+        # Nodos ollama por HTTP (modelo cargado y conexiones reutilizadas); sin él, CLI
+        self.ollama = ollama
+        # Límites de concurrencia: nodos simultáneos por run y en todo el executor
+        self.max_parallel_nodes = max_parallel_nodes
+        self.max_global_nodes = max_global_nodes
+        self._global_slots = asyncio.Semaphore(max_global_nodes)
+        # Colas de clientes SSE suscritos a cada run
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        # Bus de eventos compartido (websocket /ws/agent)
+        self.event_bus = event_bus
+        # Historial persistente + caché caliente (runs activos y los últimos terminados)
+        self.store = RunStore(self.work_dir / "runs.db")
+        # Todo el I/O de disco de los runs va a un hilo escritor (el loop nunca bloquea)
+        self.writer = RunWriter()
+        self.runs: "OrderedDict[str, PipelineRun]" = OrderedDict()
+        self.retention_days = retention_days
+        self._last_prune = 0.0
+        # run_id -> node_id -> proceso en ejecución
+        self.active_processes: Dict[str, Dict[str, asyncio.subprocess.Process]] = {}
+        # run_id -> tarea que orquesta el run
+        self._run_tasks: Dict[str, asyncio.Task] = {}
+        # Tareas que esperan el SIGKILL de procesos cancelados
+        self._reapers: Set[asyncio.Task] = set()
+
+        interrupted = self.store.mark_interrupted()
+        if interrupted:
+            logger.warning(f"{len(interrupted)} runs interrumpidos por el reinicio")
+        self._maybe_prune()
+
         logger.info(f"PipelineExecutor inicializado en {self.work_dir}")
 
+    @staticmethod
+    def _build_graph(node_ids: List[str], connections: List[Dict]) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+        """
+        Construye listas de adyacencia a partir de las conexiones.
+
+        Returns:
+            (dependents, in_degree): hijos de cada nodo y nº de padres
+        """
+        dependents: Dict[str, List[str]] = {nid: [] for nid in node_ids}
+        in_degree = {nid: 0 for nid in node_ids}
+        for conn in connections:
+            src, dst = conn.get("from"), conn.get("to")
+            if src in dependents and dst in in_degree:
+                dependents[src].append(dst)
+                in_degree[dst] += 1
+        return dependents, in_degree
+
+    @staticmethod
+    def _find_cycle(remaining: Set[str], connections: List[Dict]) -> List[str]:
+        """
+        Localiza un ciclo entre los nodos que Kahn no pudo ordenar.
+
+        Todo nodo restante tiene al menos un padre también restante, así que
+        remontando padres desde cualquiera se acaba repitiendo un nodo.
+        """
+        parent: Dict[str, str] = {}
+        for conn in connections:
+            src, dst = conn.get("from"), conn.get("to")
+            if src in remaining and dst in remaining:
+                parent.setdefault(dst, src)
+
+        path: List[str] = []
+        position: Dict[str, int] = {}
+        node_id = next(iter(remaining))
+        while node_id not in position:
+            position[node_id] = len(path)
+            path.append(node_id)
+            node_id = parent[node_id]
+
+        cycle = path[position[node_id]:]
+        cycle.reverse()  # Orden de las aristas: from -> to
+        return cycle
+
     def _build_execution_order(self, nodes: List[Dict], connections: List[Dict]) -> List[str]:
         """
-        Ordena nodos topológicamente según conexiones.
+        Ordena nodos topológicamente según conexiones (Kahn, O(V + E)).
         Retorna lista de IDs en orden de ejecución.
+
+        Raises:
+            PipelineCycleError: si las conexiones forman un ciclo
         """
-        # Construir grafo de dependencias
-        deps = {n["id"]: set() for n in nodes}
-        for conn in connections:
-            if conn["to"] in deps:
-                deps[conn["to"]].add(conn["from"])
+        node_ids = [n["id"] for n in nodes]
+        dependents, in_degree = self._build_graph(node_ids, connections)
 
-        # Ordenamiento topológico (Kahn's algorithm)
         order = []
-        ready = [nid for nid, d in deps.items() if not d]
+        ready = deque(nid for nid in node_ids if in_degree[nid] == 0)
 
         while ready:
-            node_id = ready.pop(0)
+            node_id = ready.popleft()
             order.append(node_id)
 
-            for nid, d in deps.items():
-                if node_id in d:
-                    d.remove(node_id)
-                    if not d and nid not in order:
-                        ready.append(nid)
+            for child in dependents[node_id]:
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
 
         # Si hay nodos sin procesar, hay ciclo
-        if len(order) != len(nodes):
-            logger.warning("Ciclo detectado en pipeline, usando orden original")
-            return [n["id"] for n in nodes]
+        if len(order) != len(node_ids):
+            remaining = {nid for nid, count in in_degree.items() if count > 0}
+            raise PipelineCycleError(self._find_cycle(remaining, connections))
 
         return order
 
-    def _build_command(self, tool: str, config: Dict, run_dir: Path) -> Optional[str]:
-        """Construye comando ejecutable para un tool"""
+    def compile_pipeline(self, pipeline_def: Dict) -> List[str]:
+        """
+        Valida una definición completa y devuelve su orden de ejecución.
+
+        Además de ciclos comprueba que haya nodos, ids únicos, conexiones
+        entre nodos existentes y políticas on_failure conocidas, también
+        dentro de los nodos map. execute() la aplica a toda definición que
+        no venga ya compilada.
+
+        Raises:
+            PipelineCycleError: si las conexiones forman un ciclo
+            ValueError: si la definición está mal formada
+        """
+        nodes = pipeline_def.get("nodes")
+        connections = pipeline_def.get("connections") or []
+        if not isinstance(nodes, list) or not nodes:
+            raise ValueError("El pipeline no tiene nodos")
+        if pipeline_def.get("on_failure") and pipeline_def["on_failure"] not in FAILURE_POLICIES:
+            raise ValueError(f"on_failure desconocido: {pipeline_def['on_failure']}")
+        self._check_graph(nodes, connections)
+        self._validate_graph(nodes, connections)
+        return self._build_execution_order(nodes, connections)
+
+    def _check_graph(self, nodes: List[Dict], connections: List[Dict], scope: str = ""):
+        """Comprobaciones estructurales de compile_pipeline (recursivo en nodos map)"""
+        ids = set()
+        for n in nodes:
+            if not isinstance(n, dict) or not n.get("id"):
+                raise ValueError(f"Nodo sin id{scope}")
+            if n["id"] in ids:
+                raise ValueError(f"Id de nodo duplicado{scope}: {n['id']}")
+            ids.add(n["id"])
+            policy = (n.get("config") or {}).get("on_failure")
+            if policy and policy not in FAILURE_POLICIES:
+                raise ValueError(f"on_failure desconocido en {n['id']}: {policy}")
+
+        for conn in connections:
+            for end in ("from", "to"):
+                if conn.get(end) not in ids:
+                    raise ValueError(f"Conexión a un nodo inexistente{scope}: {conn.get(end)}")
+
+        for n in nodes:
+            if n.get("tool") == "map":
+                config = n.get("config") or {}
+                if not config.get("nodes"):
+                    raise ValueError(f"El nodo map {n['id']} no tiene subgrafo (config.nodes)")
+                self._check_graph(config["nodes"], config.get("connections", []), f" en {n['id']}")
+
+    def _validate_graph(self, nodes: List[Dict], connections: List[Dict]):
+        """Comprueba que ni el grafo ni los subgrafos de sus nodos map tengan ciclos"""
+        self._build_execution_order(nodes, connections)
+        for n in nodes:
+            if n.get("tool") == "map":
+                config = n.get("config", {})
+                self._validate_graph(config.get("nodes", []), config.get("connections", []))
+
+    def _build_command(
+        self,
+        tool: str,
+        config: Dict,
+        run_dir: Path,
+        variables: Dict[str, Union[str, List[str]]] = None
+    ) -> Optional[Union[List[str], str]]:
+        """
+        Construye el comando ejecutable de un tool.
+
+        Returns:
+            Lista argv (se lanza con exec, sin shell) para los tools conocidos
+            y config.script; str solo si el nodo declara config.command, que
+            se ejecuta con shell. None si no hay nada que ejecutar.
+
+        Raises:
+            ValueError: si config.args no se puede partir en argumentos
+
+        variables ({input}, {inputs}, artefactos con nombre) se sustituyen en
+        ambos casos; en el comando shell van escapadas y el resto de llaves
+        del comando se respetan.
+        """
+        variables = variables or {}
         template = self.TOOL_COMMANDS.get(tool)
         if not template:
             # Tool genérico - buscar script o comando en config
             if "command" in config:
-                return config["command"]
+                return self._render_shell(config["command"], variables)
             if "script" in config:
-                return f"python3 {config['script']}"
-            return None
+                template = self.TOOL_COMMANDS["python"]
+            else:
+                return None
 
+        values = {"args": [], **variables, **config}
+        argv: List[str] = []
         try:
-            # Sustituir variables
-            cmd = template.format(**config)
-            return cmd
+            for arg in template:
+                for rendered in self._render_arg(arg, values):
+                    # Segunda pasada: config puede referirse a {input} y compañía
+                    argv.extend(self._render_arg(rendered, variables, strict=False))
         except KeyError as e:
             logger.error(f"Config incompleta para {tool}: falta {e}")
             return None
+        return argv
+
+    @staticmethod
+    def _render_arg(arg: str, values: Dict, strict: bool = True) -> List[str]:
+        """
+        Renderiza un argumento de argv.
+
+        "{x}" con x lista (o ffmpeg args en str) se expande a varios argumentos;
+        si no, se sustituye cada {x} dentro del argumento. strict=False deja
+        intactas las llaves desconocidas.
+        """
+        whole = re.fullmatch(r"\{(\w+)\}", arg)
+        if whole and whole.group(1) in values:
+            value = values[whole.group(1)]
+            if isinstance(value, list):
+                return [str(v) for v in value]
+            if whole.group(1) == "args":
+                try:
+                    return shlex.split(str(value))
+                except ValueError as e:
+                    # p.ej. comillas sin cerrar
+                    raise ValueError(f"args inválidos ({value!r}): {e}") from None
+            return [str(value)]
+
+        def substitute(match):
+            key = match.group(1)
+            if key not in values:
+                if strict:
+                    raise KeyError(key)
+                return match.group(0)
+            value = values[key]
+            return " ".join(map(str, value)) if isinstance(value, list) else str(value)
+
+        return [re.sub(r"\{(\w+)\}", substitute, arg)]
+
+    @staticmethod
+    def _render_shell(command: str, variables: Dict[str, Union[str, List[str]]]) -> str:
+        """Sustituye variables conocidas en un comando shell, escapándolas"""
+        def substitute(match):
+            if match.group(1) not in variables:
+                return match.group(0)
+            value = variables[match.group(1)]
+            if isinstance(value, list):
+                return " ".join(shlex.quote(v) for v in value)
+            return shlex.quote(value)
+
+        return re.sub(r"\{(\w+)\}", substitute, command)
+
+    @staticmethod
+    def _command_text(cmd: Union[List[str], str, Dict]) -> str:
+        """Representación legible (y clave de caché) de un comando"""
+        if isinstance(cmd, dict):
+            return json.dumps(cmd, sort_keys=True, ensure_ascii=False)
+        return cmd if isinstance(cmd, str) else shlex.join(cmd)
+
+    def _ollama_request(self, node: ExecutionNode, variables: Dict) -> Optional[Dict]:
+        """
+        Petición de un nodo ollama nativo.
+
+        config.prompt (o config.prompts para varios a la vez), config.model,
+        config.options y config.system; {input} y compañía se sustituyen en
+        los prompts.
+        """
+        prompts = node.config.get("prompts") or [node.config.get("prompt")]
+        if not node.config.get("model") or not all(isinstance(p, str) for p in prompts):
+            logger.error(f"Config incompleta para ollama en {node.id}: faltan model o prompt")
+            return None
+        return {
+            "model": node.config["model"],
+            "prompts": [" ".join(self._render_arg(p, variables, strict=False)) for p in prompts],
+            "options": node.config.get("options"),
+            "system": node.config.get("system")
+        }
+
+    def _has_command(self, node: ExecutionNode) -> bool:
+        return node.tool in self.TOOL_COMMANDS or "command" in node.config or "script" in node.config
+
+    @staticmethod
+    def _primary_output(node: ExecutionNode) -> str:
+        """Artefacto que un nodo pasa a los siguientes: config.output, outputs[0] o su stdout"""
+        if isinstance(node.config.get("output"), str):
+            return node.config["output"]
+        if node.config.get("outputs"):
+            return node.config["outputs"][0]
+        return f"{node.id}.out"
+
+    def _plan_data_edges(
+        self,
+        nodes_by_id: Dict[str, ExecutionNode],
+        connections: List[Dict]
+    ) -> Tuple[Dict[str, str], Set[str]]:
+        """
+        Decide cómo viajan los datos por cada conexión.
+
+        Una conexión con mode="pipe" une stdout→stdin si ambos nodos lo
+        soportan, el destino no tiene otros padres y el origen no tiene ya
+        otro pipe. Si no, se degrada a paso de artefactos por archivo.
+
+        Returns:
+            (pipe_next, capture): siguiente nodo de cada pipe y nodos cuyo
+            stdout hay que volcar a {node_id}.out para sus dependientes
+        """
+        in_degree = Counter(c.get("to") for c in connections)
+        pipe_next: Dict[str, str] = {}
+        capture: Set[str] = set()
+
+        for conn in connections:
+            src, dst = nodes_by_id.get(conn.get("from")), nodes_by_id.get(conn.get("to"))
+            if not src or not dst:
+                continue
+
+            if conn.get("mode") == "pipe":
+                reads_stdin = dst.config.get("stdin", dst.tool in self.STDIN_TOOLS or "command" in dst.config)
+                if (
+                    self._has_command(src) and self._has_command(dst) and reads_stdin
+                    and in_degree[dst.id] == 1 and src.id not in pipe_next
+                ):
+                    pipe_next[src.id] = dst.id
+                    continue
+                logger.warning(f"Pipe {src.id} -> {dst.id} no soportado, se pasa por archivo")
+
+            if self._primary_output(src) == f"{src.id}.out":
+                capture.add(src.id)
+
+        return pipe_next, capture
+
+    def _node_io(
+        self,
+        node: ExecutionNode,
+        incoming: List[Dict],
+        nodes_by_id: Dict[str, ExecutionNode],
+        pipe_next: Dict[str, str],
+        capture: Set[str]
+    ) -> NodeIO:
+        """Resuelve las variables de entrada de un nodo a partir de sus padres"""
+        io = NodeIO(stdout_file=f"{node.id}.out" if node.id in capture else "")
+        files = []
+        piped_input = False
+
+        for conn in incoming:
+            parent = nodes_by_id.get(conn.get("from"))
+            if not parent:
+                continue
+            if pipe_next.get(parent.id) == node.id:
+                piped_input = True
+                continue
+            path = self._primary_output(parent)
+            files.append(path)
+            if conn.get("as"):
+                io.variables[conn["as"]] = path
+
+        if files:
+            io.variables["input"] = files[0]
+            io.variables["inputs"] = files
+        elif piped_input:
+            io.variables["input"] = "-"  # Convención habitual para stdin
+        io.upstream_files = files
+        return io
+
+    # ========================================
+    # Plan (dry-run)
+    # ========================================
+
+    def plan_pipeline(self, pipeline_def: Dict) -> Dict:
+        """
+        Dry-run: valida el pipeline, resuelve el comando de cada nodo sin
+        ejecutar nada y estima cuánto tardará a partir del historial.
+
+        Estimación por nodo: media del mismo nodo en runs anteriores del
+        mismo pipeline; si no hay, media de su tool; si tampoco, queda sin
+        estimar (cuenta 0). Las cadenas de pipes se planifican como una
+        unidad (corren a la vez y ocupan un slot), igual que en _run_dag.
+
+        Returns:
+            nodes (comando, entradas, estimación y avisos), critical_path y
+            critical_path_seconds, total_work_seconds, max_width (nodos a la
+            vez sin límite de slots) y estimated_seconds con max_parallel slots
+
+        Raises:
+            PipelineCycleError, ValueError: como compile_pipeline
+        """
+        order = self.compile_pipeline(pipeline_def)
+        name = pipeline_def.get("name", "Unnamed Pipeline")
+        connections = pipeline_def.get("connections") or []
+        variables = {k: str(v) for k, v in (pipeline_def.get("variables") or {}).items()}
+        stats = self.store.duration_stats(name)
+        run_dir = self.work_dir / "_plan"  # Solo para resolver comandos, no se crea
+
+        nodes_by_id = {
+            n["id"]: ExecutionNode(id=n["id"], tool=n.get("tool", "python"), config=n.get("config") or {})
+            for n in pipeline_def["nodes"]
+        }
+        pipe_next, capture = self._plan_data_edges(nodes_by_id, connections)
+        incoming: Dict[str, List[Dict]] = {nid: [] for nid in nodes_by_id}
+        for conn in connections:
+            incoming[conn["to"]].append(conn)
+
+        slots = pipeline_def.get("max_parallel") or self.max_parallel_nodes
+        planned: Dict[str, Dict] = {}
+        for node_id in order:
+            node = nodes_by_id[node_id]
+            io = self._node_io(node, incoming[node_id], nodes_by_id, pipe_next, capture)
+            io.variables = {**variables, **io.variables}
+            planned[node_id] = self._plan_node(node, io, run_dir, stats, variables, slots)
+            planned[node_id]["pipe_to"] = pipe_next.get(node_id)
+
+        # Unidades de planificación: nodo suelto o cadena de pipes completa
+        piped_to = set(pipe_next.values())
+        units: List[List[str]] = []
+        unit_of: Dict[str, int] = {}
+        for node_id in order:
+            if node_id in piped_to:
+                continue
+            chain = [node_id]
+            while chain[-1] in pipe_next:
+                chain.append(pipe_next[chain[-1]])
+            for nid in chain:
+                unit_of[nid] = len(units)
+            units.append(chain)
+
+        durations = [max(planned[nid]["estimate"] or 0 for nid in chain) for chain in units]
+        parents: List[Set[int]] = [set() for _ in units]
+        for conn in connections:
+            src, dst = unit_of[conn["from"]], unit_of[conn["to"]]
+            if src != dst:
+                parents[dst].add(src)
+
+        # Camino crítico (units está en orden topológico)
+        finish: List[float] = []
+        via: List[Optional[int]] = []
+        for i in range(len(units)):
+            previous = max(parents[i], key=lambda p: finish[p], default=None)
+            finish.append((finish[previous] if previous is not None else 0) + durations[i])
+            via.append(previous)
+
+        critical_path: List[str] = []
+        unit = max(range(len(units)), key=lambda u: finish[u])
+        critical_seconds = finish[unit]
+        while unit is not None:
+            critical_path[:0] = units[unit]
+            unit = via[unit]
+
+        # Máximo de unidades solapadas con slots ilimitados (los finales antes que los inicios)
+        edges = sorted(
+            [(finish[i] - durations[i], 1) for i in range(len(units))] + [(f, -1) for f in finish]
+        )
+        width = current = 0
+        for _, delta in edges:
+            current += delta
+            width = max(width, current)
+
+        return {
+            "name": name,
+            "execution_order": order,
+            "nodes": [planned[nid] for nid in order],
+            "critical_path": critical_path,
+            "critical_path_seconds": round(critical_seconds, 3),
+            "total_work_seconds": round(sum(p["estimate"] or 0 for p in planned.values()), 3),
+            "max_width": width,
+            "max_parallel": slots,
+            "estimated_seconds": round(self._simulate_schedule(durations, parents, slots), 3),
+            "unestimated": [nid for nid in order if planned[nid]["estimate"] is None]
+        }
+
+    def _plan_node(
+        self,
+        node: ExecutionNode,
+        io: NodeIO,
+        run_dir: Path,
+        stats: Dict[str, Dict],
+        variables: Dict[str, str],
+        slots: int
+    ) -> Dict:
+        """Comando resuelto, entradas, estimación de duración y avisos de un nodo"""
+        history = stats["nodes"].get(node.id)
+        source = "node" if history else None
+        if not history and node.tool != "map":
+            history = stats["tools"].get(node.tool)
+            source = "tool" if history else None
+
+        entry = {
+            "id": node.id,
+            "tool": node.tool,
+            "kind": "none",
+            "command": None,
+            "inputs": io.upstream_files,
+            "estimate": history["avg"] if history else None,
+            "estimate_source": source,
+            "samples": history["samples"] if history else 0,
+            "warnings": []
+        }
+
+        if node.tool == "map":
+            entry["kind"] = "map"
+            entry.update(self._plan_map(node, variables, slots))
+            if entry["estimate"] is None and entry["items"] is not None:
+                entry["estimate"] = entry["per_round_seconds"] * entry["rounds"]
+                entry["estimate_source"] = "subgraph"
+            elif entry["items"] is None:
+                entry["warnings"].append("Número de items desconocido hasta ejecutar")
+            return entry
+
+        if node.tool == "ollama" and self.ollama:
+            cmd = self._ollama_request(node, io.variables)
+        else:
+            try:
+                cmd = self._build_command(node.tool, node.config, run_dir, io.variables)
+            except ValueError as e:
+                entry["warnings"].append(f"Config inválida: {e}")
+                return entry
+
+        if cmd is None:
+            if self._has_command(node):
+                entry["warnings"].append("Config incompleta: no se puede construir el comando")
+            else:
+                entry["estimate"], entry["estimate_source"] = 0.0, "noop"
+            return entry
+
+        entry["kind"] = "ollama" if isinstance(cmd, dict) else "shell" if isinstance(cmd, str) else "exec"
+        entry["command"] = self._command_text(cmd)
+        if isinstance(cmd, list) and not shutil.which(cmd[0]):
+            entry["warnings"].append(f"Ejecutable no encontrado: {cmd[0]}")
+        if self._warm_enabled(node, cmd):
+            entry["warm"] = True
+
+        timeout = self._node_limits(node)["timeout"]
+        if entry["estimate"] and timeout and entry["estimate"] > timeout:
+            entry["warnings"].append(f"La estimación ({entry['estimate']:.0f}s) supera el timeout ({timeout}s)")
+        return entry
+
+    def _plan_map(self, node: ExecutionNode, variables: Dict[str, str], slots: int) -> Dict:
+        """Plan del subgrafo de un map y nº de items si se conoce sin ejecutar"""
+        items: Optional[int] = len(node.config.get("items", []))
+        pattern = node.config.get("glob")
+        if pattern:
+            pattern = os.path.expanduser(pattern)
+            if os.path.isabs(pattern):
+                root = Path(Path(pattern).anchor)
+                items += sum(1 for p in root.glob(os.path.relpath(pattern, root)) if p.is_file())
+            else:
+                items = None  # Relativo al directorio del run, que aún no existe
+        if node.config.get("from_input"):
+            items = None
+
+        parallel = int(node.config.get("parallel") or slots)
+        subplan = self.plan_pipeline({
+            "name": f"{node.id} (map)",
+            "nodes": node.config.get("nodes", []),
+            "connections": node.config.get("connections", []),
+            "max_parallel": slots,
+            "variables": variables
+        })
+        return {
+            "items": items,
+            "parallel": parallel,
+            "rounds": -(-items // max(min(parallel, slots), 1)) if items is not None else None,
+            "per_round_seconds": subplan["critical_path_seconds"],
+            "subgraph": subplan["nodes"]
+        }
+
+    @staticmethod
+    def _simulate_schedule(durations: List[float], parents: List[Set[int]], slots: int) -> float:
+        """Duración con slots limitados, lanzando las unidades listas en orden de llegada como _run_chain"""
+        children: List[List[int]] = [[] for _ in durations]
+        pending = [len(p) for p in parents]
+        for child, ps in enumerate(parents):
+            for parent in ps:
+                children[parent].append(child)
+
+        ready = deque(i for i, count in enumerate(pending) if count == 0)
+        running: List[Tuple[float, int]] = []
+        now = 0.0
+        while ready or running:
+            while ready and len(running) < max(slots, 1):
+                unit = ready.popleft()
+                heapq.heappush(running, (now + durations[unit], unit))
+            now, unit = heapq.heappop(running)
+            for child in children[unit]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+        return now
 
     async def execute(
         self,
         pipeline_def: Dict,
         on_progress: Callable[[PipelineRun], None] = None,
-        on_complete: Callable[[PipelineRun], None] = None
+        on_complete: Callable[[PipelineRun], None] = None,
+        execution_order: List[str] = None
     ) -> str:
         """
-        Ejecuta un pipeline de forma asíncrona.
+        Encola un pipeline y lo ejecuta de forma asíncrona en cuanto haya hueco.
 
         Args:
-            pipeline_def: Definición del pipeline (nodes, connections)
+            pipeline_def: Definición del pipeline (nodes, connections, max_parallel,
+                priority, cache, on_failure, variables)
             on_progress: Callback para progreso
             on_complete: Callback al terminar
+            execution_order: Orden ya compilado con compile_pipeline() (pipelines
+                guardados); si viene, la definición no se vuelve a validar
 
         Returns:
             run_id: ID de la ejecución
+
+        Raises:
+            PipelineCycleError: si las conexiones forman un ciclo
+            ValueError: si la definición está mal formada (ver compile_pipeline)
+            ExecutorBusyError: si la cola ya tiene max_queued_runs runs esperando
         """
+        nodes_def = pipeline_def.get("nodes", [])
+        connections = pipeline_def.get("connections", [])
+
+        # Validar la definición antes de crear nada en disco
+        if execution_order is None:
+            self.compile_pipeline(pipeline_def)
+
+        if len(self._queued) >= self.max_queued_runs:
+            self._rejected_runs += 1
+            raise ExecutorBusyError(
+                f"Cola de ejecución llena ({len(self._queued)} runs esperando)"
+            )
+
         run_id = f"run_{int(time.time())}_{uuid.uuid4().hex[:6]}"
         run_dir = self.work_dir / run_id
         run_dir.mkdir(parents=True, exist_ok=True)
 
-        nodes_def = pipeline_def.get("nodes", [])
-        connections = pipeline_def.get("connections", [])
-
         # Crear nodos de ejecución
         exec_nodes = [
             ExecutionNode(
@@ -214,110 +1012,274 @@ class PipelineExecutor:
         run = PipelineRun(
             id=run_id,
             pipeline_name=pipeline_def.get("name", "Unnamed Pipeline"),
-            nodes=exec_nodes
+            nodes=exec_nodes,
+            connections=connections,
+            max_parallel=pipeline_def.get("max_parallel") or 0,
+            priority=pipeline_def.get("priority") or 0,
+            cache=bool(pipeline_def.get("cache", False)),
+            on_failure=pipeline_def.get("on_failure") or "skip-dependents",
+            variables={k: str(v) for k, v in (pipeline_def.get("variables") or {}).items()},
+            status="queued"
         )
-        self.runs[run_id] = run
 
-        # Guardar definición
-        (run_dir / "pipeline.json").write_text(json.dumps(pipeline_def, indent=2))
+        # Guardar definición (también sirve para retomar el run)
+        self.writer.write_json(run_dir / "pipeline.json", pipeline_def)
 
-        # Ejecutar en background
-        asyncio.create_task(self._execute_pipeline(run, run_dir, on_progress, on_complete))
-
-        logger.info(f"Pipeline iniciado: {run_id} con {len(exec_nodes)} nodos")
+        self._enqueue(run, run_dir, on_progress, on_complete)
+        logger.info(f"Pipeline {run.status}: {run_id} con {len(exec_nodes)} nodos")
         return run_id
 
-    async def _execute_pipeline(
+    def _enqueue(self, run: PipelineRun, run_dir: Path, on_progress: Callable, on_complete: Callable):
+        """Registra el run, lo encola por prioridad y arranca lo que quepa"""
+        self.runs[run.id] = run
+        self.runs.move_to_end(run.id)
+        self._save_run(run)
+        self._publish_status(run)
+
+        self._queued[run.id] = (run, run_dir, on_progress, on_complete)
+        heapq.heappush(self._queue, (-run.priority, next(self._queue_seq), run.id))
+        self._dispatch()
+
+    def resume_run(
         self,
-        run: PipelineRun,
-        run_dir: Path,
-        on_progress: Callable,
-        on_complete: Callable
-    ):
-        """Ejecuta el pipeline secuencialmente"""
-        run.status = "running"
-        run.started_at = time.time()
+        run_id: str,
+        on_progress: Callable = None,
+        on_complete: Callable = None
+    ) -> Optional[str]:
+        """
+        Retoma un run interrumpido, fallido o cancelado.
 
-        nodes_by_id = {n.id: n for n in run.nodes}
+        Los nodos que terminaron con éxito según checkpoint.json, y cuyos
+        artefactos siguen en el directorio del run, no se repiten. Se vuelven
+        a ejecutar los demás y todo lo que depende de ellos; una cadena de
+        pipes se repite entera si alguno de sus nodos no terminó.
 
-        # Ordenar ejecución
-        nodes_def = [{"id": n.id, "tool": n.tool, "config": n.config} for n in run.nodes]
-        order = self._build_execution_order(nodes_def, [])  # TODO: pasar connections
+        Returns:
+            run_id, o None si el run no existe o no guardó su definición
 
-        total = len(order)
-        completed = 0
+        Raises:
+            ValueError: si el run sigue activo
+            ExecutorBusyError: si la cola está llena
+        """
+        run_dir = self.work_dir / run_id
+        pipeline_path = run_dir / "pipeline.json"
+        if not pipeline_path.exists():
+            return None
+        if run_id in self._run_tasks or (run_id in self.runs and self.runs[run_id].is_active):
+            raise ValueError(f"El run {run_id} sigue activo o terminando")
+        if len(self._queued) >= self.max_queued_runs:
+            self._rejected_runs += 1
+            raise ExecutorBusyError(
+                f"Cola de ejecución llena ({len(self._queued)} runs esperando)"
+            )
 
-        try:
-            for node_id in order:
-                node = nodes_by_id.get(node_id)
-                if not node:
-                    continue
+        pipeline_def = json.loads(pipeline_path.read_text())
+        previous = self._read_checkpoint(run_dir) or self.get_run(run_id) or {}
+        states = {n["id"]: n for n in previous.get("nodes", [])}
 
-                run.current_node = node_id
-                node.status = NodeStatus.RUNNING
-                node.started_at = time.time()
+        exec_nodes = [
+            ExecutionNode(id=n["id"], tool=n.get("tool", "python"), config=n.get("config", {}))
+            for n in pipeline_def.get("nodes", [])
+        ]
+        nodes_by_id = {n.id: n for n in exec_nodes}
+        connections = pipeline_def.get("connections", [])
+        dependents, _ = self._build_graph(list(nodes_by_id), connections)
+        pipe_next, capture = self._plan_data_edges(nodes_by_id, connections)
+
+        def reusable(node: ExecutionNode) -> bool:
+            state = states.get(node.id, {})
+            if state.get("status") != NodeStatus.SUCCESS.value:
+                return False
+            artifacts = [
+                a for a in node.config.get("outputs", []) + [node.config.get("output")]
+                if isinstance(a, str)
+            ]
+            if node.id in capture:
+                artifacts.append(f"{node.id}.out")
+            return all((run_dir / a).exists() for a in artifacts)
+
+        keep = {n.id for n in exec_nodes if reusable(n)}
+
+        # Cadenas de pipes: todo o nada (el stream intermedio no se guarda)
+        piped_to = set(pipe_next.values())
+        for head in [nid for nid in pipe_next if nid not in piped_to]:
+            chain = [head]
+            while chain[-1] in pipe_next:
+                chain.append(pipe_next[chain[-1]])
+            if not keep.issuperset(chain):
+                keep.difference_update(chain)
+
+        # Lo que depende de un nodo que se repite también se repite
+        stack = [nid for nid in nodes_by_id if nid not in keep]
+        while stack:
+            for child in dependents[stack.pop()]:
+                if child in keep:
+                    keep.discard(child)
+                    stack.append(child)
+
+        for node_id in keep:
+            node, state = nodes_by_id[node_id], states[node_id]
+            node.status = NodeStatus.SUCCESS
+            node.resumed = True
+            node.started_at = state.get("started_at", 0)
+            node.finished_at = state.get("finished_at", 0)
+            node.attempts = state.get("attempts", 0)
+            node.cached = state.get("cached", False)
+            node.rusage = state.get("rusage") or {}
+            if state.get("output"):
+                node.output_tail.append(state["output"])
 
-                if on_progress:
-                    on_progress(run)
+        run = PipelineRun(
+            id=run_id,
+            pipeline_name=pipeline_def.get("name", "Unnamed Pipeline"),
+            nodes=exec_nodes,
+            connections=connections,
+            max_parallel=pipeline_def.get("max_parallel") or 0,
+            priority=pipeline_def.get("priority") or 0,
+            cache=bool(pipeline_def.get("cache", False)),
+            on_failure=pipeline_def.get("on_failure") or "skip-dependents",
+            variables={k: str(v) for k, v in (pipeline_def.get("variables") or {}).items()},
+            status="queued",
+            created_at=previous.get("created_at") or time.time(),
+            resumes=previous.get("resumes", 0) + 1
+        )
+        self._enqueue(run, run_dir, on_progress, on_complete)
+        logger.info(f"Pipeline {run_id} retomado: {len(keep)}/{len(exec_nodes)} nodos reutilizados")
+        return run_id
 
-                # Construir y ejecutar comando
-                cmd = self._build_command(node.tool, node.config, run_dir)
+    @staticmethod
+    def _read_checkpoint(run_dir: Path) -> Optional[Dict]:
+        """Último estado guardado de un run (checkpoint.json o, si no, result.json)"""
+        for name in ("checkpoint.json", "result.json"):
+            path = run_dir / name
+            if path.exists():
+                try:
+                    return json.loads(path.read_text())
+                except ValueError:
+                    logger.warning(f"{path} ilegible, se ignora")
+        return None
+
+    def _write_checkpoint(self, run: PipelineRun, run_dir: Path):
+        """Guarda el estado por nodo del run (atómico, en el hilo escritor)"""
+        self.writer.write_json(run_dir / "checkpoint.json", run.to_dict())
+
+    def _publish_status(self, run: PipelineRun):
+        self._publish(run.id, {
+            "event": "status",
+            "status": run.status,
+            "pipeline_name": run.pipeline_name,
+            "progress": run.progress
+        })
+
+    def _save_run(self, run: PipelineRun):
+        """Actualiza el run en el historial desde el hilo escritor (se coalesce por run)"""
+        self.writer.call(("run", run.id), self.store.save_run, run.to_dict())
+
+    def _can_start(self, pipeline_name: str) -> bool:
+        """Comprueba el límite de runs simultáneos de un pipeline (0 = sin límite)"""
+        limit = self.pipeline_limits.get(pipeline_name, 0)
+        return not limit or self._active_by_pipeline[pipeline_name] < limit
+
+    def _dispatch(self):
+        """
+        Arranca runs de la cola por prioridad mientras haya slots libres.
 
-                if cmd:
-                    try:
-                        # Ejecutar proceso
-                        process = await asyncio.create_subprocess_shell(
-                            cmd,
-                            stdout=asyncio.subprocess.PIPE,
-                            stderr=asyncio.subprocess.PIPE,
-                            cwd=str(run_dir)
-                        )
+        Los runs bloqueados por el límite de su pipeline no frenan a los de
+        detrás: se saltan y vuelven a la cola.
+        """
+        skipped = []
+        while self._queue and len(self._run_tasks) < self.max_concurrent_runs:
+            entry = heapq.heappop(self._queue)
+            run_id = entry[2]
+            if run_id not in self._queued:
+                continue  # Cancelado mientras esperaba
 
-                        stdout, stderr = await asyncio.wait_for(
-                            process.communicate(),
-                            timeout=300  # 5 min timeout por nodo
-                        )
+            run = self._queued[run_id][0]
+            if not self._can_start(run.pipeline_name):
+                skipped.append(entry)
+                continue
 
-                        node.output = stdout.decode() if stdout else ""
-                        node.error = stderr.decode() if stderr else ""
-
-                        if process.returncode == 0:
-                            node.status = NodeStatus.SUCCESS
-                        else:
-                            node.status = NodeStatus.ERROR
-                            logger.error(f"Nodo {node_id} falló: {node.error}")
-
-                    except asyncio.TimeoutError:
-                        node.status = NodeStatus.ERROR
-                        node.error = "Timeout: proceso excedió 5 minutos"
-                    except Exception as e:
-                        node.status = NodeStatus.ERROR
-                        node.error = str(e)
-                else:
-                    # Sin comando, simular éxito (nodo de visualización)
-                    node.status = NodeStatus.SUCCESS
-                    node.output = f"[{node.tool}] Nodo sin comando ejecutable"
+            self._start_run(*self._queued.pop(run_id))
 
-                node.finished_at = time.time()
-                completed += 1
-                run.progress = int((completed / total) * 100)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
 
-                # Guardar output
-                (run_dir / f"{node_id}.log").write_text(
-                    f"=== {node.tool} ===\n{node.output}\n\n=== ERRORS ===\n{node.error}"
-                )
+    def _start_run(self, run: PipelineRun, run_dir: Path, on_progress: Callable, on_complete: Callable):
+        """Lanza la tarea de un run y reserva sus slots"""
+        run.status = "running"
+        self._active_by_pipeline[run.pipeline_name] += 1
+        self._save_run(run)
+        self._publish_status(run)
+
+        task = asyncio.create_task(self._execute_pipeline(run, run_dir, on_progress, on_complete))
+        self._run_tasks[run.id] = task
+        task.add_done_callback(lambda _: self._finish_run(run))
+
+    def _finish_run(self, run: PipelineRun):
+        """Libera los slots de un run terminado y deja pasar al siguiente"""
+        self._run_tasks.pop(run.id, None)
+        if not run.finished_at:
+            # Cancelado antes de que la tarea llegara a arrancar
+            for node in run.nodes:
+                if node.status == NodeStatus.PENDING:
+                    node.status = NodeStatus.SKIPPED
+            run.finished_at = time.time()
+            self._archive_run(run)
+            self._publish(run.id, {"event": "end", "status": run.status})
+        self._active_by_pipeline[run.pipeline_name] -= 1
+        if self._active_by_pipeline[run.pipeline_name] <= 0:
+            del self._active_by_pipeline[run.pipeline_name]
+        self._dispatch()
+
+    def get_queue_stats(self) -> Dict:
+        """Métricas de la cola de ejecución"""
+        return {
+            "running": len(self._run_tasks),
+            "queued": len(self._queued),
+            "max_concurrent_runs": self.max_concurrent_runs,
+            "max_queued_runs": self.max_queued_runs,
+            "rejected": self._rejected_runs,
+            "running_by_pipeline": dict(self._active_by_pipeline),
+            "queued_by_pipeline": dict(Counter(args[0].pipeline_name for args in self._queued.values()))
+        }
+
+    async def _execute_pipeline(
+        self,
+        run: PipelineRun,
+        run_dir: Path,
+        on_progress: Callable,
+        on_complete: Callable
+    ):
+        """
+        Ejecuta el pipeline como un DAG.
 
-                if on_progress:
-                    on_progress(run)
+        Lanza en paralelo todos los nodos cuyas dependencias ya terminaron,
+        respetando el límite por run (max_parallel) y el global del executor.
+        """
+        run.started_at = time.time()
+        run_slots = asyncio.Semaphore(run.max_parallel or self.max_parallel_nodes)
 
-                # Si hay error, decidir si continuar o parar
-                if node.status == NodeStatus.ERROR:
-                    # Por ahora, continuar con otros nodos
-                    pass
+        def on_batch(completed: int, total: int):
+            run.progress = int((completed / total) * 100)
+            if on_progress:
+                on_progress(run)
+            self._publish(run.id, {"event": "progress", "progress": run.progress, "completed": completed})
+            self._write_checkpoint(run, run_dir)
+
+        try:
+            await self._run_dag(
+                run, run.nodes, run.connections, run_dir, run_slots, on_progress, on_batch,
+                variables=run.variables
+            )
 
             # Determinar estado final
             errors = [n for n in run.nodes if n.status == NodeStatus.ERROR]
             run.status = "error" if errors else "success"
+            run.progress = 100
+
+        except asyncio.CancelledError:
+            # cancel_run(): _run_dag ya paró los nodos activos y omitió los que faltan
+            run.status = "cancelled"
 
         except Exception as e:
             logger.exception(f"Error ejecutando pipeline {run.id}")
@@ -325,57 +1287,1111 @@ class PipelineExecutor:
 
         run.finished_at = time.time()
         run.current_node = ""
+        self.active_processes.pop(run.id, None)
 
         # Guardar resultado
-        (run_dir / "result.json").write_text(json.dumps(run.to_dict(), indent=2))
+        self.writer.write_json(run_dir / "result.json", run.to_dict())
+        self._archive_run(run)
+        self._publish(run.id, {"event": "end", "status": run.status})
 
         if on_complete:
             on_complete(run)
 
         logger.info(f"Pipeline {run.id} completado: {run.status}")
 
+    async def _run_dag(
+        self,
+        run: PipelineRun,
+        nodes: List[ExecutionNode],
+        connections: List[Dict],
+        run_dir: Path,
+        run_slots: asyncio.Semaphore,
+        on_progress: Callable,
+        on_batch: Callable[[int, int], None] = None,
+        variables: Dict[str, str] = None
+    ):
+        """
+        Ejecuta un grafo de nodos: el pipeline entero o el subgrafo de un item de un map.
+
+        Los nodos ya en SUCCESS (resume_run) cuentan como terminados.
+        on_batch(completados, total) se llama tras cada tanda de nodos
+        terminados. variables se añaden a las de cada nodo (las de sus
+        conexiones tienen prioridad). Si se cancela, para lo que está corriendo y marca SKIPPED
+        lo pendiente antes de propagar la cancelación.
+        """
+        nodes_by_id = {n.id: n for n in nodes}
+
+        # Grafo de dependencias: nodo -> hijos, nodo -> nº de padres pendientes
+        dependents, pending_deps = self._build_graph(list(nodes_by_id), connections)
+
+        # Paso de datos: cadenas de pipes stdout→stdin y artefactos por archivo
+        pipe_next, capture = self._plan_data_edges(nodes_by_id, connections)
+        incoming: Dict[str, List[Dict]] = {nid: [] for nid in nodes_by_id}
+        for conn in connections:
+            if conn.get("to") in incoming:
+                incoming[conn["to"]].append(conn)
+
+        total = len(nodes_by_id)
+        completed = 0
+        running: Dict[asyncio.Task, List[str]] = {}
+
+        for node in nodes:
+            if node.status == NodeStatus.SUCCESS:
+                completed += 1
+                for child in dependents[node.id]:
+                    pending_deps[child] -= 1
+        ready = [
+            nid for nid, count in pending_deps.items()
+            if count == 0 and nodes_by_id[nid].status == NodeStatus.PENDING
+        ]
+
+        def node_io(node_id: str) -> NodeIO:
+            io = self._node_io(nodes_by_id[node_id], incoming[node_id], nodes_by_id, pipe_next, capture)
+            if variables:
+                io.variables = {**variables, **io.variables}
+            return io
+
+        def skip_pending():
+            for node in nodes:
+                if node.status == NodeStatus.PENDING:
+                    node.status = NodeStatus.SKIPPED
+
+        try:
+            while ready or running:
+                for node_id in ready:
+                    if nodes_by_id[node_id].tool == "map":
+                        # Sin slot propio: sus items los piden al ejecutar sus nodos
+                        task = asyncio.create_task(self._run_map(
+                            run, nodes_by_id[node_id], node_io(node_id), run_dir, run_slots, on_progress
+                        ))
+                        running[task] = [node_id]
+                        continue
+
+                    # Un nodo con pipe de salida arranca junto a toda su cadena
+                    chain = [node_id]
+                    while chain[-1] in pipe_next:
+                        chain.append(pipe_next[chain[-1]])
+                    ios = [node_io(nid) for nid in chain]
+                    task = asyncio.create_task(self._run_chain(
+                        run, [nodes_by_id[nid] for nid in chain], ios, run_dir, run_slots, on_progress
+                    ))
+                    running[task] = chain
+                ready = []
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                abort = False
+                finished_ids = []
+                for task in done:
+                    chain = running.pop(task)
+                    error = None if task.cancelled() else task.exception()
+                    if error is not None:
+                        # Excepción no controlada: sus nodos fallan, nunca cuentan como éxito
+                        self._fail_unfinished(run, [nodes_by_id[nid] for nid in chain], error)
+                    finished_ids.extend(chain)
+
+                for node_id in finished_ids:
+                    node = nodes_by_id[node_id]
+                    completed += 1
+
+                    policy = self._failure_policy(run, node)
+                    if node.status == NodeStatus.ERROR and policy == "fail-fast":
+                        abort = True
+                    elif node.status == NodeStatus.ERROR and policy == "skip-dependents":
+                        completed += self._skip_descendants(run, node_id, dependents, nodes_by_id)
+                    else:
+                        # Liberar hijos cuyas dependencias ya están completas
+                        for child in dependents[node_id]:
+                            pending_deps[child] -= 1
+                            if pending_deps[child] == 0 and nodes_by_id[child].status == NodeStatus.PENDING:
+                                ready.append(child)
+
+                if on_batch:
+                    on_batch(completed, total)
+
+                if abort:
+                    # fail-fast: parar lo que está corriendo y omitir el resto
+                    for task in running:
+                        task.cancel()
+                    await asyncio.gather(*running, return_exceptions=True)
+                    running.clear()
+                    skip_pending()
+                    break
+
+        except asyncio.CancelledError:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            skip_pending()
+            raise
+
+        except Exception:
+            for task in running:
+                task.cancel()
+            raise
+
+    def _fail_unfinished(self, run: PipelineRun, nodes: List[ExecutionNode], error: BaseException):
+        """Marca ERROR los nodos de una tarea que terminó con una excepción sin acabar ellos"""
+        logger.opt(exception=error).error(f"Error no controlado en {', '.join(n.id for n in nodes)}")
+        for node in nodes:
+            if node.status not in (NodeStatus.PENDING, NodeStatus.RUNNING):
+                continue
+            node.status = NodeStatus.ERROR
+            node.error_tail.append(f"Error interno: {error}\n")
+            node.finished_at = time.time()
+            if not node.parent:
+                self._publish(run.id, {
+                    "event": "node",
+                    "node": node.id,
+                    "status": node.status.value,
+                    "duration": node.duration
+                })
+
+    def _failure_policy(self, run: PipelineRun, node: ExecutionNode) -> str:
+        """Política ante error: config.on_failure del nodo o la del pipeline"""
+        policy = node.config.get("on_failure") or run.on_failure
+        if policy not in FAILURE_POLICIES:
+            logger.warning(f"Política on_failure desconocida '{policy}' en {node.id}, usando skip-dependents")
+            return "skip-dependents"
+        return policy
+
+    def _skip_descendants(
+        self,
+        run: PipelineRun,
+        failed_id: str,
+        dependents: Dict[str, List[str]],
+        nodes_by_id: Dict[str, ExecutionNode]
+    ) -> int:
+        """Marca SKIPPED todo el subárbol de un nodo fallido. Retorna cuántos nodos omitió"""
+        skipped = 0
+        stack = list(dependents[failed_id])
+        while stack:
+            node = nodes_by_id[stack.pop()]
+            if node.status != NodeStatus.PENDING:
+                continue
+            node.status = NodeStatus.SKIPPED
+            node.error_tail.append(f"Omitido: falló {failed_id}\n")
+            skipped += 1
+            if not node.parent:
+                self._publish(run.id, {"event": "node", "node": node.id, "status": node.status.value})
+            stack.extend(dependents[node.id])
+        if skipped:
+            logger.info(f"Nodo {failed_id} falló: {skipped} nodos dependientes omitidos")
+        return skipped
+
+    # ========================================
+    # Nodos map (fan-out por items)
+    # ========================================
+
+    @staticmethod
+    def _map_items(node: ExecutionNode, io: NodeIO, run_dir: Path) -> List[str]:
+        """
+        Items de un nodo map, en este orden:
+        config.items (lista), config.glob (relativo al directorio del run,
+        ordenado) y, con config.from_input, una línea no vacía por item de
+        cada artefacto de entrada.
+        """
+        items = [str(item) for item in node.config.get("items", [])]
+
+        pattern = node.config.get("glob")
+        if pattern:
+            pattern = os.path.expanduser(pattern)
+            root = run_dir.resolve()
+            if os.path.isabs(pattern):
+                root = Path(Path(pattern).anchor)
+                pattern = os.path.relpath(pattern, root)
+            items.extend(str(path) for path in sorted(root.glob(pattern)) if path.is_file())
+
+        if node.config.get("from_input"):
+            for name in io.upstream_files:
+                path = run_dir / name
+                if path.exists():
+                    items.extend(
+                        line.strip() for line in path.read_text(errors="replace").splitlines() if line.strip()
+                    )
+        return items
+
+    @staticmethod
+    def _map_variables(index: int, item: str, run_dir: Path) -> Dict[str, str]:
+        """Variables de un item: {item}, {item_name}, {item_stem}, {index} y {run_dir}"""
+        return {
+            "item": item,
+            "item_name": Path(item).name,
+            "item_stem": Path(item).stem,
+            "index": str(index),
+            "run_dir": str(run_dir.resolve())
+        }
+
+    @staticmethod
+    def _expand_map_item(
+        node: ExecutionNode,
+        index: int,
+        variables: Dict[str, str]
+    ) -> Tuple[List[ExecutionNode], List[Dict]]:
+        """
+        Copia del subgrafo de un map para un item.
+
+        Los ids pasan a ser {map}.{índice}.{id}. Las variables del item se
+        sustituyen en la config (outputs incluidos, para que caché y
+        artefactos usen el nombre final); config.command las recibe
+        escapadas por _render_shell.
+        """
+        def render(value, key: str = None):
+            if isinstance(value, str) and key != "command":
+                return re.sub(r"\{(\w+)\}", lambda m: variables.get(m.group(1), m.group(0)), value)
+            if isinstance(value, list):
+                return [render(v) for v in value]
+            if isinstance(value, dict):
+                return {k: render(v, k) for k, v in value.items()}
+            return value
+
+        prefix = f"{node.id}.{index:04d}."
+        nodes = [
+            ExecutionNode(
+                id=prefix + n["id"],
+                tool=n.get("tool", "python"),
+                config=render(n.get("config", {})),
+                parent=node.id
+            )
+            for n in node.config.get("nodes", [])
+        ]
+        connections = [
+            {**conn, "from": prefix + str(conn.get("from")), "to": prefix + str(conn.get("to"))}
+            for conn in node.config.get("connections", [])
+        ]
+        return nodes, connections
+
+    async def _run_map(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        io: NodeIO,
+        run_dir: Path,
+        run_slots: asyncio.Semaphore,
+        on_progress: Callable
+    ):
+        """
+        Nodo map: ejecuta su subgrafo (config.nodes + config.connections) una
+        vez por item, todo dentro del mismo run.
+
+        config.parallel: items a la vez (default: max_parallel del run)
+        config.max_failures: items fallidos tras los que se omiten los restantes
+
+        Cada item corre en {map}/{índice:04d}/ y sus nodos comparten los slots
+        del run y globales con el resto del pipeline. El map no publica un
+        evento por nodo de cada item sino su resumen (node.items). Su artefacto
+        es un JSON por línea con el estado de cada item; termina en error si
+        algún item falló o se omitió.
+        """
+        node.status = NodeStatus.RUNNING
+        node.started_at = time.time()
+        node.attempts = 1
+        if not node.parent:
+            run.current_node = node.id
+            self._publish(run.id, {"event": "node", "node": node.id, "status": node.status.value})
+            if on_progress:
+                on_progress(run)
+
+        log = self.writer.open(run_dir / f"{node.id}.log")
+        results = self.writer.open(run_dir / self._primary_output(node))
+        try:
+            items = await asyncio.to_thread(self._map_items, node, io, run_dir)
+            counts = {"total": len(items), "done": 0, "success": 0, "error": 0, "skipped": 0}
+            node.items = counts
+            log.write(f"=== map: {len(items)} items ===\n")
+
+            parallel = int(node.config.get("parallel") or run.max_parallel or self.max_parallel_nodes)
+            max_failures = node.config.get("max_failures")
+            item_slots = asyncio.Semaphore(max(parallel, 1))
+
+            async def run_item(index: int, item: str):
+                async with item_slots:
+                    if max_failures is not None and counts["error"] >= int(max_failures):
+                        status = NodeStatus.SKIPPED
+                    else:
+                        status = await self._run_map_item(run, node, index, item, run_dir, run_slots, on_progress)
+
+                counts["done"] += 1
+                counts[status.value] += 1
+                item_dir = f"{node.id}/{index:04d}"
+                results.write(json.dumps({"index": index, "item": item, "status": status.value, "dir": item_dir}) + "\n")
+                if status != NodeStatus.SUCCESS:
+                    self._emit_line(run, node, "stderr", f"[{index}] {item}: {status.value} (ver {item_dir})", log)
+                self._publish(run.id, {"event": "map", "node": node.id, **counts})
+
+            await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+
+            failed = counts["error"] + counts["skipped"]
+            node.status = NodeStatus.ERROR if failed else NodeStatus.SUCCESS
+            self._emit_line(
+                run, node, "stdout",
+                f"[map] {counts['success']}/{counts['total']} items correctos"
+                f" ({counts['error']} con error, {counts['skipped']} omitidos)", log
+            )
+
+        except asyncio.CancelledError:
+            node.status = NodeStatus.ERROR
+            self._emit_line(run, node, "stderr", "Cancelado", log)
+            raise
+
+        except Exception as e:
+            logger.exception(f"Error en nodo map {node.id}")
+            node.status = NodeStatus.ERROR
+            self._emit_line(run, node, "stderr", f"Error en map: {e}", log)
+
+        finally:
+            await results.aclose()
+            await log.aclose()
+            node.finished_at = time.time()
+
+        if not node.parent:
+            self._publish(run.id, {
+                "event": "node",
+                "node": node.id,
+                "status": node.status.value,
+                "duration": node.duration,
+                "items": node.items
+            })
+
+    async def _run_map_item(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        index: int,
+        item: str,
+        run_dir: Path,
+        run_slots: asyncio.Semaphore,
+        on_progress: Callable
+    ) -> NodeStatus:
+        """Ejecuta el subgrafo de un map para un item. Retorna el estado del item"""
+        item_dir = run_dir / node.id / f"{index:04d}"
+        await asyncio.to_thread(item_dir.mkdir, parents=True, exist_ok=True)
+
+        variables = {**run.variables, **self._map_variables(index, item, run_dir)}
+        nodes, connections = self._expand_map_item(node, index, variables)
+        await self._run_dag(run, nodes, connections, item_dir, run_slots, on_progress, variables=variables)
+
+        for sub in nodes:
+            merge_rusage(node.rusage, sub.rusage)
+        if any(n.status == NodeStatus.ERROR for n in nodes):
+            return NodeStatus.ERROR
+        return NodeStatus.SUCCESS
+
+    async def _run_chain(
+        self,
+        run: PipelineRun,
+        chain: List[ExecutionNode],
+        ios: List[NodeIO],
+        run_dir: Path,
+        run_slots: asyncio.Semaphore,
+        on_progress: Callable
+    ):
+        """
+        Ejecuta un nodo, o una cadena de nodos unidos por pipes, respetando
+        los límites de concurrencia. Una cadena ocupa un solo slot: sus
+        nodos tienen que correr a la vez o el pipe se bloquearía.
+        """
+        async with run_slots, self._global_slots:
+            for upstream, downstream in zip(ios, ios[1:]):
+                pipe = asyncio.Queue(maxsize=self.PIPE_QUEUE_CHUNKS)
+                upstream.stdout = pipe
+                downstream.stdin = pipe
+
+            await asyncio.gather(*(
+                self._run_node(run, node, io, run_dir, on_progress)
+                for node, io in zip(chain, ios)
+            ))
+
+    async def _run_node(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        io: NodeIO,
+        run_dir: Path,
+        on_progress: Callable
+    ):
+        """
+        Ejecuta un nodo: caché, comando con reintentos y eventos de estado.
+
+        Los nodos de un item de un map no publican eventos propios: el map
+        resume el progreso de todos sus items.
+        """
+        node.status = NodeStatus.RUNNING
+        node.started_at = time.time()
+        if not node.parent:
+            run.current_node = node.id
+            self._publish(run.id, {"event": "node", "node": node.id, "status": node.status.value})
+            if on_progress:
+                on_progress(run)
+
+        log = self.writer.open(run_dir / f"{node.id}.log")
+        stdin_taken = False  # El pipe de entrada ya lo consume (o consumió) el proceso
+        try:
+            log.write(f"=== {node.tool} ===\n")
+
+            # Construir y ejecutar comando
+            if node.tool == "ollama" and self.ollama:
+                cmd = self._ollama_request(node, io.variables)
+            else:
+                cmd = self._build_command(node.tool, node.config, run_dir, io.variables)
+
+            if cmd:
+                log.write(f"$ {self._command_text(cmd)}\n")
+                cache_key = None
+                if self._cache_enabled(run, node) and not io.piped:
+                    inputs = self._node_inputs(node, run_dir) + [run_dir / f for f in io.upstream_files]
+                    cache_key = await asyncio.to_thread(
+                        self.cache.make_key, node.tool, self._command_text(cmd), inputs
+                    )
+
+                if cache_key and await self._restore_cached(run, node, cache_key, run_dir, log):
+                    pass
+                else:
+                    stdin_taken = True
+                    await self._run_with_retries(run, node, cmd, io, run_dir, log)
+
+                    if cache_key and node.status == NodeStatus.SUCCESS:
+                        outputs = list(node.config.get("outputs", []))
+                        if io.stdout_file:
+                            outputs.append(io.stdout_file)
+                        await asyncio.to_thread(
+                            self.cache.store, cache_key, run_dir, outputs, node.output, node.error
+                        )
+            else:
+                # Sin comando, simular éxito (nodo de visualización)
+                node.status = NodeStatus.SUCCESS
+                self._emit_line(run, node, "stdout", f"[{node.tool}] Nodo sin comando ejecutable", log)
+                self._close_pipe(io.stdout)
+                if io.stdin:
+                    # Nadie lo va a leer: vaciarlo para no bloquear al nodo anterior
+                    await self._feed_stdin(None, io.stdin)
+        except Exception as e:
+            # Comando, clave de caché o restauración: el nodo falla, el run sigue su política
+            if isinstance(e, ValueError):
+                logger.error(f"Nodo {node.id} con config inválida: {e}")
+            else:
+                logger.exception(f"Error preparando nodo {node.id}")
+            node.status = NodeStatus.ERROR
+            self._emit_line(run, node, "stderr", f"Error: {e}", log)
+            self._close_pipe(io.stdout)
+            if io.stdin and not stdin_taken:
+                await self._feed_stdin(None, io.stdin)
+        finally:
+            await log.aclose()
+
+        node.finished_at = time.time()
+        if not node.parent:
+            self._publish(run.id, {
+                "event": "node",
+                "node": node.id,
+                "status": node.status.value,
+                "duration": node.duration,
+                "cached": node.cached,
+                "rusage": node.rusage or None
+            })
+
+    async def _run_with_retries(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        cmd: Union[List[str], str, Dict],
+        io: NodeIO,
+        run_dir: Path,
+        log
+    ):
+        """
+        Ejecuta el nodo reintentando los fallos con backoff exponencial.
+
+        config.retries: reintentos tras el primer intento (default 0)
+        config.retry_backoff: segundos antes del primer reintento (se dobla cada vez)
+
+        Los nodos unidos por pipe no se reintentan: su stream ya se consumió.
+        """
+        retries = 0 if io.piped else int(node.config.get("retries", 0))
+        backoff = float(node.config.get("retry_backoff", self.DEFAULT_RETRY_BACKOFF))
+
+        for attempt in range(retries + 1):
+            node.attempts = attempt + 1
+            if isinstance(cmd, dict):
+                await self._run_ollama(run, node, cmd, io, run_dir, log)
+            else:
+                await self._run_process(run, node, cmd, io, run_dir, log)
+            if node.status == NodeStatus.SUCCESS or attempt == retries:
+                return
+
+            delay = min(backoff * (2 ** attempt), self.MAX_RETRY_BACKOFF)
+            self._emit_line(
+                run, node, "stderr",
+                f"[retry] Intento {attempt + 1}/{retries + 1} falló, reintentando en {delay:.1f}s", log
+            )
+            await asyncio.sleep(delay)
+
+    def _node_limits(self, node: ExecutionNode) -> Dict:
+        """Límites efectivos: DEFAULT_LIMITS < TOOL_LIMITS[tool] < config del nodo"""
+        limits = dict(DEFAULT_LIMITS)
+        limits.update(TOOL_LIMITS.get(node.tool, {}))
+        limits.update({k: node.config[k] for k in DEFAULT_LIMITS if k in node.config})
+        return limits
+
+    async def _run_process(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        cmd: Union[List[str], str],
+        io: NodeIO,
+        run_dir: Path,
+        log
+    ):
+        """Lanza el comando de un nodo con sus límites y vuelca su output según llega"""
+        limits = self._node_limits(node)
+        timeout = float(limits["timeout"]) if limits["timeout"] else None
+        node.output_bytes = 0
+        node.limit_exceeded = ""
+        feeder = None
+        process = None
+        stdout_file = self.writer.open(run_dir / io.stdout_file, binary=True) if io.stdout_file else None
+
+        try:
+            # Sesión propia: el nodo y sus hijos forman un grupo de procesos.
+            # Se recogen con wait4 para guardar su rusage; solo config.command
+            # explícito (cmd en str) pasa por /bin/sh
+            if self._warm_enabled(node, cmd):
+                process = await self.python_pool.spawn(
+                    cmd[1:], cwd=run_dir, limits=limits, stdin=bool(io.stdin)
+                )
+            else:
+                process = await spawn_process(
+                    cmd, cwd=run_dir, stdin=bool(io.stdin), preexec_fn=_spawn_limits(limits)
+                )
+                _apply_nice(process.pid, limits)
+            self.active_processes.setdefault(run.id, {})[node.id] = process
+
+            if io.stdin:
+                feeder = asyncio.create_task(self._feed_stdin(process, io.stdin))
+
+            max_bytes = limits["max_output_bytes"]
+            pumps = [
+                asyncio.create_task(self._pump_stream(
+                    run, node, process, "stdout", log, max_bytes, io.stdout, stdout_file
+                )),
+                asyncio.create_task(self._pump_stream(run, node, process, "stderr", log, max_bytes))
+            ]
+            try:
+                await asyncio.wait_for(self._wait_process(process, pumps), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._signal_process_group(process, signal.SIGKILL)
+                await process.wait()
+                # Un nieto puede mantener abierto el pipe, o el nodo siguiente
+                # dejar de leer: no esperar a los pumps más del margen de gracia
+                _, stuck = await asyncio.wait(pumps, timeout=self.KILL_GRACE_SECONDS)
+                for pump in stuck:
+                    pump.cancel()
+                raise
+            except asyncio.CancelledError:
+                # SIGTERM ahora, SIGKILL en segundo plano: el slot se libera ya
+                self._terminate_process_group(process)
+                for pump in pumps:
+                    pump.cancel()
+                raise
+            finally:
+                self.active_processes.get(run.id, {}).pop(node.id, None)
+
+            if process.returncode == 0 and not node.limit_exceeded:
+                node.status = NodeStatus.SUCCESS
+            else:
+                node.status = NodeStatus.ERROR
+                if node.limit_exceeded:
+                    reason = f"Límite excedido: {node.limit_exceeded}"
+                elif process.returncode < 0:
+                    reason = f"Terminado por señal {signal.Signals(-process.returncode).name}"
+                else:
+                    reason = f"exit {process.returncode}"
+                self._emit_line(run, node, "stderr", reason, log)
+                logger.error(f"Nodo {node.id} falló ({reason}): {node.error[-500:]}")
+
+        except asyncio.TimeoutError:
+            node.status = NodeStatus.ERROR
+            self._emit_line(run, node, "stderr", f"Timeout: proceso excedió {timeout:g}s", log)
+        except asyncio.CancelledError:
+            node.status = NodeStatus.ERROR
+            node.finished_at = time.time()
+            self._emit_line(run, node, "stderr", "Cancelado", log)
+            if feeder:
+                feeder.cancel()
+            raise
+        except Exception as e:
+            node.status = NodeStatus.ERROR
+            self._emit_line(run, node, "stderr", str(e), log)
+            if io.stdin and not feeder:
+                # Sin proceso que lo lea: vaciar el pipe para no bloquear al nodo anterior
+                feeder = asyncio.create_task(self._feed_stdin(None, io.stdin))
+        finally:
+            if process is not None:
+                merge_rusage(node.rusage, process.rusage)
+            if stdout_file:
+                await stdout_file.aclose()
+            if io.stdout and node.status == NodeStatus.SUCCESS:
+                await io.stdout.put(None)  # EOF tras el último trozo
+            else:
+                # Falló o se canceló: el stream ya está incompleto, EOF sin bloquear
+                self._close_pipe(io.stdout)
+
+    async def _run_ollama(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        request: Dict,
+        io: NodeIO,
+        run_dir: Path,
+        log
+    ):
+        """
+        Nodo ollama contra el servidor HTTP local.
+
+        Con un solo prompt los tokens van al log y a los suscriptores según
+        se generan; con config.prompts se lanzan todos a la vez y el output
+        es una línea JSON {"prompt", "response"} por prompt. Un pipe de
+        entrada se añade al final de cada prompt.
+        """
+        limits = self._node_limits(node)
+        timeout = float(limits["timeout"]) if limits["timeout"] else None
+        node.output_bytes = 0
+        node.limit_exceeded = ""
+        stdout_file = self.writer.open(run_dir / io.stdout_file, binary=True) if io.stdout_file else None
+        prompts = request["prompts"]
+        single = len(prompts) == 1
+        pending = [""]
+
+        def on_token(index: int, token: str):
+            if not single:
+                return
+            log.write(token)
+            if not node.parent:
+                self._publish(run.id, {"event": "token", "node": node.id, "text": token})
+            *lines, pending[0] = (pending[0] + token).split("\n")
+            for line in lines:
+                node.output_tail.append(line + "\n")
+
+        try:
+            if io.stdin:
+                piped = b"".join([chunk async for chunk in self._drain_pipe(io.stdin)])
+                prompts = [f"{p}\n\n{piped.decode(errors='replace')}" for p in prompts]
+
+            results = await asyncio.wait_for(
+                self.ollama.generate_many(
+                    request["model"], prompts, request.get("options"), request.get("system"), on_token
+                ),
+                timeout=timeout
+            )
+
+            if single:
+                if pending[0]:
+                    node.output_tail.append(pending[0] + "\n")
+                log.write("\n")
+                text = results[0]["response"]
+            else:
+                lines = [
+                    json.dumps({"prompt": p, "response": r["response"]}, ensure_ascii=False)
+                    for p, r in zip(request["prompts"], results)
+                ]
+                for line in lines:
+                    self._emit_line(run, node, "stdout", line, log)
+                text = "\n".join(lines)
+
+            data = (text + "\n").encode()
+            node.output_bytes = len(data)
+            if stdout_file:
+                stdout_file.write(data)
+            if io.stdout:
+                await io.stdout.put(data)
+
+            eval_count = sum(r.get("eval_count", 0) for r in results)
+            seconds = max(r.get("total_duration", 0) for r in results) / 1e9
+            log.write(f"[ollama] {request['model']}: {eval_count} tokens en {seconds:.1f}s\n")
+            node.status = NodeStatus.SUCCESS
+
+        except asyncio.TimeoutError:
+            node.status = NodeStatus.ERROR
+            self._emit_line(run, node, "stderr", f"Timeout: ollama excedió {timeout:g}s", log)
+        except asyncio.CancelledError:
+            node.status = NodeStatus.ERROR
+            node.finished_at = time.time()
+            self._emit_line(run, node, "stderr", "Cancelado", log)
+            raise
+        except (OllamaError, OSError, ValueError) as e:
+            node.status = NodeStatus.ERROR
+            self._emit_line(run, node, "stderr", f"ollama: {e}", log)
+            logger.error(f"Nodo {node.id} falló (ollama): {e}")
+        finally:
+            if stdout_file:
+                await stdout_file.aclose()
+            if io.stdout and node.status == NodeStatus.SUCCESS:
+                await io.stdout.put(None)
+            else:
+                self._close_pipe(io.stdout)
+
+    @staticmethod
+    async def _drain_pipe(pipe: asyncio.Queue):
+        """Trozos de un pipe de entrada hasta su EOF"""
+        while True:
+            chunk = await pipe.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def _warm_enabled(self, node: ExecutionNode, cmd: Union[List[str], str]) -> bool:
+        """Nodo python opt-in (config.warm) y hay pool de workers configurado"""
+        return (
+            self.python_pool is not None
+            and bool(node.config.get("warm"))
+            and isinstance(cmd, list)
+            and len(cmd) >= 2
+            and cmd[0] == "python3"
+        )
+
+    async def _feed_stdin(self, process: Optional[asyncio.subprocess.Process], pipe: asyncio.Queue):
+        """
+        Copia los trozos del nodo anterior al stdin del proceso.
+
+        Sigue vaciando la cola aunque el proceso ya no lea (p.ej. `head`)
+        para que el nodo anterior nunca se quede bloqueado.
+        """
+        writing = process is not None
+        while True:
+            chunk = await pipe.get()
+            if chunk is None:
+                break
+            if not writing:
+                continue
+            try:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                writing = False
+
+        if writing:
+            try:
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    @staticmethod
+    def _close_pipe(pipe: Optional[asyncio.Queue]):
+        """Señala EOF al nodo siguiente sin bloquear (descarta lo más antiguo si está llena)"""
+        if pipe is None:
+            return
+        while True:
+            try:
+                pipe.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                pipe.get_nowait()
+
+    # ========================================
+    # Caché de nodos
+    # ========================================
+
+    @staticmethod
+    def _cache_enabled(run: PipelineRun, node: ExecutionNode) -> bool:
+        """La caché es opt-in: config.cache del nodo o cache del pipeline"""
+        return bool(node.config.get("cache", run.cache))
+
+    @staticmethod
+    def _node_inputs(node: ExecutionNode, run_dir: Path) -> List[Path]:
+        """Archivos de entrada declarados (config.input / config.inputs)"""
+        declared = list(node.config.get("inputs", []))
+        if isinstance(node.config.get("input"), str):
+            declared.append(node.config["input"])
+        return [run_dir / Path(p).expanduser() for p in declared]
+
+    async def _restore_cached(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        key: str,
+        run_dir: Path,
+        log
+    ) -> bool:
+        """Reutiliza el resultado cacheado de un nodo si existe"""
+        entry = await asyncio.to_thread(self.cache.restore, key, run_dir)
+        if entry is None:
+            return False
+
+        for stream_name in ("stdout", "stderr"):
+            for line in entry.get(stream_name, "").splitlines():
+                self._emit_line(run, node, stream_name, line, log)
+        log.write(f"[cache] Resultado reutilizado ({key[:12]})\n")
+
+        node.status = NodeStatus.SUCCESS
+        node.cached = True
+        logger.info(f"Nodo {node.id} servido desde caché")
+        return True
+
+    @staticmethod
+    async def _wait_process(process: asyncio.subprocess.Process, pumps: List[asyncio.Task]):
+        """Espera a que el proceso termine y a que se vacíen sus pipes"""
+        await process.wait()
+        await asyncio.wait(pumps)
+
+    @staticmethod
+    def _signal_process_group(process: asyncio.subprocess.Process, sig: int):
+        """Envía una señal a todo el grupo de procesos de un nodo"""
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _terminate_process_group(self, process: asyncio.subprocess.Process):
+        """SIGTERM al grupo y SIGKILL si sigue vivo tras KILL_GRACE_SECONDS"""
+        self._signal_process_group(process, signal.SIGTERM)
+
+        async def reap():
+            try:
+                await asyncio.wait_for(process.wait(), timeout=self.KILL_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                self._signal_process_group(process, signal.SIGKILL)
+                await process.wait()
+
+        reaper = asyncio.create_task(reap())
+        self._reapers.add(reaper)
+        reaper.add_done_callback(self._reapers.discard)
+
+    async def _pump_stream(
+        self,
+        run: PipelineRun,
+        node: ExecutionNode,
+        process: asyncio.subprocess.Process,
+        stream_name: str,
+        log,
+        max_bytes: Optional[int] = None,
+        pipe: Optional[asyncio.Queue] = None,
+        sink=None
+    ):
+        """
+        Lee un stream del proceso por trozos y emite cada línea según llega.
+
+        Si el nodo supera max_bytes entre stdout y stderr se mata su grupo.
+        Cada trozo se copia también al pipe del nodo siguiente y/o al
+        archivo de artefacto (sink), si los hay.
+        """
+        stream = process.stdout if stream_name == "stdout" else process.stderr
+        pending = b""
+        while True:
+            chunk = await stream.read(self.STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            node.output_bytes += len(chunk)
+            if max_bytes and node.output_bytes > max_bytes:
+                if not node.limit_exceeded:
+                    node.limit_exceeded = f"max_output_bytes ({max_bytes})"
+                    self._signal_process_group(process, signal.SIGKILL)
+                break
+
+            if sink:
+                sink.write(chunk)
+            if pipe:
+                await pipe.put(chunk)  # Backpressure: espera si el siguiente va lento
+
+            # \r también separa líneas (barras de progreso de ffmpeg/whisper)
+            *lines, pending = re.split(rb"\r\n|\r|\n", pending + chunk)
+            for raw in lines:
+                if raw:
+                    self._emit_line(run, node, stream_name, raw.decode(errors="replace"), log)
+
+            if len(pending) > self.MAX_LINE_BYTES:
+                self._emit_line(run, node, stream_name, pending.decode(errors="replace"), log)
+                pending = b""
+
+        if pending:
+            self._emit_line(run, node, stream_name, pending.decode(errors="replace"), log)
+
+    def _emit_line(self, run: PipelineRun, node: ExecutionNode, stream_name: str, line: str, log):
+        """Guarda una línea en el ring buffer del nodo, el log y los suscriptores"""
+        tail = node.output_tail if stream_name == "stdout" else node.error_tail
+        tail.append(line + "\n")
+
+        prefix = "" if stream_name == "stdout" else "[stderr] "
+        log.write(f"{prefix}{line}\n")
+
+        if not node.parent:
+            self._publish(run.id, {"event": "log", "node": node.id, "stream": stream_name, "line": line})
+
+    # ========================================
+    # Streaming (SSE)
+    # ========================================
+
+    def _publish(self, run_id: str, event: Dict):
+        """Envía un evento a los suscriptores del run y al bus sin bloquear"""
+        final = event["event"] == "end"
+        for queue in self._subscribers.get(run_id, []):
+            while True:
+                try:
+                    queue.put_nowait(event)
+                    break
+                except asyncio.QueueFull:
+                    if not final:
+                        break  # Cliente lento: se pierde la línea, el log en disco está completo
+                    # "end" siempre llega: cierra el stream del cliente
+                    queue.get_nowait()
+
+        if self.event_bus:
+            kind = event["event"]
+            if kind in ("log", "token"):
+                self.event_bus.publish("run.log", {"run_id": run_id, **event})
+            else:
+                # Por run y nodo solo interesa el último estado de cada ráfaga
+                key = f"{run_id}:{kind}:{event['node']}" if "node" in event else f"{run_id}:{kind}"
+                self.event_bus.publish("run", {"run_id": run_id, **event}, key=key)
+
+    async def stream_run(self, run_id: str):
+        """
+        Generador de eventos de un run para SSE.
+
+        Primero reenvía las líneas en memoria de cada nodo y después las nuevas
+        según llegan. Termina con un evento "end" al acabar el run.
+        """
+        run = self.runs.get(run_id)
+        if not run:
+            archived = self.store.get_run(run_id)
+            if archived:
+                yield {"event": "end", "status": archived["status"]}
+            return
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(run_id, []).append(queue)
+
+        # Snapshot síncrono: ninguna línea puede colarse entre suscribir y copiar
+        backlog = []
+        for node in run.nodes:
+            for stream_name, tail in (("stdout", node.output_tail), ("stderr", node.error_tail)):
+                backlog.extend(
+                    {"event": "log", "node": node.id, "stream": stream_name, "line": line.rstrip("\n")}
+                    for line in tail
+                )
+        finished = run.status not in ("pending", "queued", "running")
+
+        try:
+            for event in backlog:
+                yield event
+
+            if finished:
+                yield {"event": "end", "status": run.status}
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.SUBSCRIBER_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # Red de seguridad: si el run ya terminó, no esperar un "end" perdido
+                    if run.status not in ("pending", "queued", "running"):
+                        yield {"event": "end", "status": run.status}
+                        return
+                    continue
+                yield event
+                if event["event"] == "end":
+                    return
+        finally:
+            subscribers = self._subscribers.get(run_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                self._subscribers.pop(run_id, None)
+
     def get_run(self, run_id: str) -> Optional[Dict]:
-        """Obtiene estado de una ejecución"""
+        """Obtiene estado de una ejecución (memoria o historial)"""
         run = self.runs.get(run_id)
-        return run.to_dict() if run else None
+        return run.to_dict() if run else self.store.get_run(run_id)
 
-    def get_runs(self, limit: int = 10) -> List[Dict]:
-        """Lista ejecuciones recientes"""
-        runs = sorted(
-            self.runs.values(),
-            key=lambda r: r.started_at,
-            reverse=True
-        )[:limit]
-        return [r.to_dict() for r in runs]
+    def get_runs(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        status: str = None,
+        pipeline_name: str = None
+    ) -> List[Dict]:
+        """Lista ejecuciones recientes desde el historial (los activos, en vivo)"""
+        runs = self.store.list_runs(limit, offset, status=status, pipeline_name=pipeline_name)
+        return [self.runs[r["id"]].to_dict() if r["id"] in self.runs else r for r in runs]
+
+    def count_runs(self, status: str = None, pipeline_name: str = None) -> int:
+        """Total de ejecuciones en el historial"""
+        return self.store.count_runs(status=status, pipeline_name=pipeline_name)
+
+    def get_tool_stats(self, days: float = None) -> List[Dict]:
+        """Uso de recursos agregado por tool (últimos `days` días o todo el historial)"""
+        return self.store.tool_stats(since=time.time() - days * 86400 if days else None)
+
+    def _archive_run(self, run: PipelineRun):
+        """Persiste un run terminado y recorta la caché caliente"""
+        self._save_run(run)
+
+        self.runs.move_to_end(run.id)
+        finished = [rid for rid, r in self.runs.items() if not r.is_active]
+        for rid in finished[:-self.HOT_FINISHED_RUNS]:
+            del self.runs[rid]
+
+        self._maybe_prune()
 
     def cancel_run(self, run_id: str) -> bool:
-        """Cancela una ejecución en progreso"""
+        """
+        Cancela una ejecución en progreso.
+
+        Si el run sigue en cola se retira sin más. Si está corriendo, termina
+        el grupo de procesos de cada nodo activo (SIGTERM y SIGKILL tras
+        KILL_GRACE_SECONDS), marca como SKIPPED los nodos pendientes y libera
+        sus slots de concurrencia.
+        """
         run = self.runs.get(run_id)
-        if not run or run.status != "running":
+        if not run:
+            return False
+
+        # Todavía en cola: basta con sacarlo
+        if run_id in self._queued:
+            del self._queued[run_id]
+            for node in run.nodes:
+                node.status = NodeStatus.SKIPPED
+            run.status = "cancelled"
+            run.finished_at = time.time()
+            self._archive_run(run)
+            self._publish(run_id, {"event": "end", "status": run.status})
+            logger.info(f"Pipeline {run_id} cancelado (en cola)")
+            return True
+
+        task = self._run_tasks.get(run_id)
+        if run.status != "running" or not task:
             return False
 
         run.status = "cancelled"
-        run.finished_at = time.time()
+        task.cancel()
 
-        # TODO: Matar procesos activos
         logger.info(f"Pipeline {run_id} cancelado")
         return True
 
-    def cleanup_old_runs(self, max_age_hours: int = 24):
-        """Limpia ejecuciones antiguas"""
-        cutoff = time.time() - (max_age_hours * 3600)
-        to_remove = []
-
-        for run_id, run in self.runs.items():
-            if run.finished_at and run.finished_at < cutoff:
-                to_remove.append(run_id)
-
-        for run_id in to_remove:
-            del self.runs[run_id]
+    def _maybe_prune(self):
+        """Aplica la retención como mucho una vez cada PRUNE_INTERVAL_SECONDS"""
+        if time.time() - self._last_prune < self.PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.time()
+        self.writer.call("prune", self._prune_history, self.retention_days * 24 * 3600)
+
+    def _prune_history(self, max_age_seconds: float) -> List[str]:
+        """Borra del historial y del disco los runs terminados hace más de max_age_seconds"""
+        removed = self.store.prune(max_age_seconds)
+        for run_id in removed:
             run_dir = self.work_dir / run_id
             if run_dir.exists():
-                import shutil
                 shutil.rmtree(run_dir, ignore_errors=True)
 
-        if to_remove:
-            logger.info(f"Limpiadas {len(to_remove)} ejecuciones antiguas")
+        if removed:
+            logger.info(f"Limpiadas {len(removed)} ejecuciones antiguas")
+        return removed
+
+    def cleanup_old_runs(self, max_age_hours: int = 24):
+        """Borra del historial y del disco las ejecuciones antiguas"""
+        for run_id in self._prune_history(max_age_hours * 3600):
+            self.runs.pop(run_id, None)
@@ -0,0 +1,201 @@
+"""
+Index Jobs - DirectOS Knowledge Base
+====================================
+Indexaciones de la Knowledge Base como trabajos en background.
+
+POST /api/index crea un IndexJob y responde al momento con su id; la
+indexación (CPU: lectura, chunks, embeddings) corre en un hilo con
+asyncio.to_thread, así que el servidor sigue respondiendo mientras se
+indexa una carpeta grande. Progreso y resultado se consultan por id o
+llegan por el EventBus (topic "index").
+
+Los trabajos se ejecutan de uno en uno (comparten manifest y colección);
+pedir otra vez una carpeta que ya se está indexando devuelve su trabajo.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+
+
+@dataclass
+class IndexJob:
+    """Una indexación de carpeta"""
+    id: str
+    folder: str
+    batch_size: Optional[int] = None
+    force: bool = False
+    status: str = "pending"  # pending, running, completed, cancelled, error
+    phase: str = "pending"   # scanning, indexing, cleanup
+    files_total: int = 0
+    files_done: int = 0
+    chunks: int = 0
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("pending", "running")
+
+    @property
+    def elapsed(self) -> float:
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> Dict:
+        elapsed = self.elapsed
+        return {
+            "id": self.id,
+            "folder": self.folder,
+            "status": self.status,
+            "phase": self.phase,
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "chunks": self.chunks,
+            "progress": round(self.files_done / self.files_total * 100, 1) if self.files_total else 0,
+            "files_per_second": round(self.files_done / elapsed, 1) if elapsed else 0,
+            "chunks_per_second": round(self.chunks / elapsed, 1) if elapsed else 0,
+            "elapsed": round(elapsed, 2),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class IndexJobManager:
+    """
+    Cola de indexaciones de la Knowledge Base.
+
+    Uso:
+        jobs = IndexJobManager(knowledge, on_event=lambda e: event_bus.publish("index", e))
+        job = jobs.start("~/Desktop")   # desde el event loop
+        jobs.get(job.id).to_dict()
+        jobs.cancel(job.id)
+    """
+
+    # Trabajos terminados que se conservan para consultar su resultado
+    MAX_FINISHED_JOBS = 50
+    # Intervalo mínimo entre eventos de progreso de un trabajo (segundos)
+    PROGRESS_INTERVAL = 0.25
+
+    def __init__(self, knowledge, on_event: Optional[Callable[[Dict], None]] = None):
+        self.knowledge = knowledge
+        self.on_event = on_event
+        self._jobs: Dict[str, IndexJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+        self._last_emit: Dict[str, float] = {}
+
+    def start(self, folder_path: str, batch_size: int = None, force: bool = False) -> IndexJob:
+        """Encolar la indexación de una carpeta (llamar desde el event loop)"""
+        folder = str(Path(folder_path).expanduser().resolve())
+        for job in self._jobs.values():
+            if job.active and job.folder == folder and job.force == force:
+                return job
+
+        job = IndexJob(id=f"index_{uuid.uuid4().hex[:8]}", folder=folder, batch_size=batch_size, force=force)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        self._prune()
+        logger.info(f"Indexación {job.id} encolada: {folder}")
+        self._emit(job)
+        return job
+
+    async def _run(self, job: IndexJob):
+        try:
+            async with self._lock:
+                if job.cancel_event.is_set():
+                    job.status = "cancelled"
+                    return
+
+                job.status = "running"
+                job.started_at = time.time()
+                self._emit(job)
+                try:
+                    result = await asyncio.to_thread(
+                        self.knowledge.index_folder,
+                        job.folder,
+                        batch_size=job.batch_size,
+                        force=job.force,
+                        on_progress=lambda progress: self._on_progress(job, progress),
+                        cancel=job.cancel_event
+                    )
+                    job.result = result
+                    job.chunks = result.get("chunks", job.chunks)
+                    job.status = "cancelled" if result.get("cancelled") else "completed"
+                except Exception as e:
+                    logger.exception(f"Error en indexación {job.id}")
+                    job.status = "error"
+                    job.error = str(e)
+        except asyncio.CancelledError:
+            job.cancel_event.set()
+            job.status = "cancelled"
+        finally:
+            job.finished_at = time.time()
+            self._tasks.pop(job.id, None)
+            self._last_emit.pop(job.id, None)
+            logger.info(f"Indexación {job.id}: {job.status} ({job.files_done}/{job.files_total} archivos, {job.chunks} chunks)")
+            self._emit(job)
+
+    def _on_progress(self, job: IndexJob, progress: Dict):
+        """Callback de index_folder (desde sus hilos)"""
+        job.phase = progress["phase"]
+        job.files_total = progress["files_total"]
+        job.files_done = progress["files_done"]
+        job.chunks = progress["chunks"]
+
+        now = time.monotonic()
+        if now - self._last_emit.get(job.id, 0) >= self.PROGRESS_INTERVAL:
+            self._last_emit[job.id] = now
+            self._emit(job)
+
+    def _emit(self, job: IndexJob):
+        if self.on_event:
+            self.on_event({"event": "index", **job.to_dict()})
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IndexJob]:
+        """Trabajos, el más reciente primero"""
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancelar un trabajo pendiente o en curso"""
+        job = self._jobs.get(job_id)
+        if not job or not job.active:
+            return False
+        job.cancel_event.set()
+        if job.status == "pending":
+            # Aún esperando turno: sale de la cola sin llegar a empezar
+            self._tasks[job_id].cancel()
+        logger.info(f"Cancelando indexación {job_id}")
+        return True
+
+    def cancel_all(self):
+        for job in self._jobs.values():
+            if job.active:
+                job.cancel_event.set()
+
+    def get_stats(self) -> Dict:
+        return {
+            "jobs": len(self._jobs),
+            "active": sum(1 for job in self._jobs.values() if job.active)
+        }
@@ -0,0 +1,106 @@
+"""
+Index Manifest - DirectOS Knowledge Base
+========================================
+Registro de los archivos indexados en la Knowledge Base, para reindexar
+solo lo que cambia.
+
+Por archivo: ruta, mtime, tamaño, hash del contenido e ids de sus chunks
+en ChromaDB. Con mtime y tamaño iguales el archivo ni se lee; si cambian
+pero el hash coincide (p.ej. un `touch`) tampoco se vuelve a embeber.
+
+Se guarda en SQLite junto a la colección y se mantiene en memoria: una
+reindexación sin cambios de ~20k notas solo hace stat() de cada archivo.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path       TEXT PRIMARY KEY,
+    mtime      REAL NOT NULL,
+    size       INTEGER NOT NULL,
+    hash       TEXT NOT NULL,
+    chunk_ids  TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+"""
+
+
+class IndexManifest:
+    """
+    Manifest de archivos indexados.
+
+    Uso:
+        manifest = IndexManifest(data_dir / "manifest.db")
+        entry = manifest.get("/notes/a.md")  # {"mtime", "size", "hash", "chunk_ids"} o None
+        manifest.put("/notes/a.md", mtime, size, digest, ["3f2a..._0", "3f2a..._1"])
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        self._files: dict[str, dict] = {}
+        for path, mtime, size, digest, chunk_ids in self._conn.execute(
+            "SELECT path, mtime, size, hash, chunk_ids FROM files"
+        ):
+            self._files[path] = {"mtime": mtime, "size": size, "hash": digest, "chunk_ids": json.loads(chunk_ids)}
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def get(self, path: str) -> Optional[dict]:
+        return self._files.get(path)
+
+    def put(self, path: str, mtime: float, size: int, digest: str, chunk_ids: list[str]):
+        """Registra (o actualiza) un archivo indexado"""
+        entry = {"mtime": mtime, "size": size, "hash": digest, "chunk_ids": list(chunk_ids)}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (path, mtime, size, digest, json.dumps(entry["chunk_ids"]), time.time())
+            )
+            self._files[path] = entry
+
+    def put_many(self, entries: list[tuple[str, float, int, str, list[str]]]):
+        """put() de varios archivos en una sola transacción"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, mtime, size, digest, json.dumps(ids), now) for path, mtime, size, digest, ids in entries]
+            )
+            for path, mtime, size, digest, ids in entries:
+                self._files[path] = {"mtime": mtime, "size": size, "hash": digest, "chunk_ids": list(ids)}
+
+    def remove(self, paths: Iterable[str]):
+        paths = [p for p in paths if p in self._files]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+            for path in paths:
+                del self._files[path]
+
+    def paths_under(self, folder: Path) -> list[str]:
+        """Archivos registrados dentro de una carpeta (recursivo)"""
+        prefix = str(Path(folder)).rstrip("/") + "/"
+        return [p for p in self._files if p.startswith(prefix)]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files")
+            self._files.clear()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
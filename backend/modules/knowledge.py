@@ -6,12 +6,37 @@ Indexa archivos markdown y permite búsqueda semántica usando embeddings.
 Stack:
 - sentence-transformers (all-MiniLM-L6-v2) para embeddings
 - ChromaDB para almacenamiento vectorial
+
+La indexación es incremental: un manifest (IndexManifest) recuerda mtime,
+tamaño, hash e ids de chunks de cada archivo, así que reindexar una carpeta
+solo re-embebe los archivos nuevos o modificados y borra los chunks de los
+que ya no existen.
+
+Pipeline de indexación (index_folder):
+    lectores (procesos) → embeddings (hilo que llama) → escritor (hilo)
+- Lectores: ProcessPoolExecutor que lee, hashea y trocea (modules.chunking)
+- Embeddings: una sola etapa; agrupa chunks de muchos archivos en lotes fijos
+  y llama a model.encode, que ya reparte cada lote entre todos los núcleos
+- Escritor: upserts en ChromaDB y altas en el manifest
+Entre etapas hay colas acotadas (ventana de archivos en vuelo en el pool y
+una Queue de lotes), así que la memoria no crece con el tamaño de la carpeta.
 """
 
+from collections import OrderedDict, deque
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 from loguru import logger
-import re
+import multiprocessing
+import os
+import queue
+import threading
+
+from modules.chunking import chunk_text, prepare_file
+from modules.index_manifest import IndexManifest
 
 try:
     from sentence_transformers import SentenceTransformer
@@ -23,6 +48,184 @@ except ImportError:
     logger.warning("Dependencias de Knowledge Base no instaladas")
 
 
+class EmbeddingBatcher:
+    """
+    Etapa de embeddings: agrupa los chunks de muchos archivos en lotes de
+    tamaño fijo y los embebe con una sola llamada a model.encode por lote.
+
+    Con miles de notas pequeñas, embeber archivo por archivo deja la CPU en
+    el overhead de cada llamada en lugar de en el modelo. Los lotes ya
+    embebidos pasan a sink (ChunkWriter.write o la cola del escritor).
+
+    Cada lote lleva, además de sus chunks:
+    - fresh:     archivos nuevos en el manifest, cuyos chunks antiguos (ids
+                 por nombre de archivo) hay que borrar antes del upsert
+    - completed: archivos cuyo último chunk va en este lote; un archivo
+                 puede repartirse entre lotes y entra en el manifest al final
+
+    Uso:
+        batcher = EmbeddingBatcher(kb.model, 256, sink=writer.write)
+        for prepared in archivos_cambiados:
+            batcher.add(prepared)
+        batcher.flush()
+    """
+
+    def __init__(self, model, batch_size: int, sink: Callable[[dict], None]):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.sink = sink
+
+        self._ids: list[str] = []
+        self._documents: list[str] = []
+        self._metadatas: list[dict] = []
+        self._fresh: list[str] = []
+        self._completed: list[dict] = []
+        # path -> chunks del archivo aún sin asignar a un lote
+        self._remaining: dict[str, int] = {}
+        self._files: dict[str, dict] = {}
+
+        self.batches = 0
+
+    def add(self, prepared: dict):
+        """Encolar los chunks de un archivo; embebe los lotes que se completen"""
+        path = prepared["path"]
+        if prepared["old_ids"] is None:
+            self._fresh.append(path)
+
+        chunks = prepared["chunks"]
+        if not chunks:
+            self._completed.append(prepared)
+            return
+
+        self._remaining[path] = len(chunks)
+        self._files[path] = prepared
+        self._ids.extend(prepared["ids"])
+        self._documents.extend(chunks)
+        self._metadatas.extend({"source": path, "chunk": i} for i in range(len(chunks)))
+
+        while len(self._ids) >= self.batch_size:
+            self._emit(self.batch_size)
+
+    def flush(self):
+        """Embeber lo que quede en un último lote (incompleto)"""
+        if self._ids or self._fresh or self._completed:
+            self._emit(len(self._ids))
+
+    def _emit(self, count: int):
+        ids, self._ids = self._ids[:count], self._ids[count:]
+        documents, self._documents = self._documents[:count], self._documents[count:]
+        metadatas, self._metadatas = self._metadatas[:count], self._metadatas[count:]
+
+        completed, self._completed = self._completed, []
+        for metadata in metadatas:
+            path = metadata["source"]
+            self._remaining[path] -= 1
+            if self._remaining[path] == 0:
+                del self._remaining[path]
+                completed.append(self._files.pop(path))
+
+        embeddings, error = None, None
+        if documents:
+            try:
+                embeddings = self.model.encode(documents, batch_size=count).tolist()
+            except Exception as e:
+                logger.error(f"Error embebiendo lote de {count} chunks: {e}")
+                error = str(e)
+
+        fresh, self._fresh = self._fresh, []
+        self.batches += 1
+        self.sink({
+            "ids": ids,
+            "documents": documents,
+            "metadatas": metadatas,
+            "embeddings": embeddings,
+            "error": error,
+            "fresh": fresh,
+            "completed": completed
+        })
+
+
+class ChunkWriter:
+    """
+    Etapa de escritura: upsert de cada lote en ChromaDB y alta en el
+    manifest de los archivos que completa.
+
+    Los lotes se escriben en orden, así que cuando llega el último chunk de
+    un archivo ya se sabe si alguno de sus lotes falló; en ese caso el
+    archivo queda fuera del manifest y se reintenta en la próxima indexación.
+    """
+
+    def __init__(self, kb: "KnowledgeBase", on_write: Callable[[int], None] = None):
+        self.kb = kb
+        self.on_write = on_write
+        self._failed: set[str] = set()
+
+        self.files = 0
+        self.chunks = 0
+        self.errors = 0
+
+    def run(self, batches: "queue.Queue[Optional[dict]]"):
+        """Bucle del hilo escritor: consume lotes hasta recibir None"""
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            try:
+                self.write(batch)
+            except Exception as e:
+                # Nunca dejar de consumir: la etapa de embeddings se bloquearía
+                logger.error(f"Error en el escritor de la Knowledge Base: {e}")
+                self.errors += len(batch["completed"])
+
+    def write(self, batch: dict):
+        collection = self.kb.collection
+        try:
+            for path in batch["fresh"]:
+                # Primera vez en el manifest: quitar chunks de indexaciones
+                # anteriores (ids antiguos por nombre de archivo)
+                collection.delete(where={"source": path})
+
+            if batch["error"]:
+                raise RuntimeError(batch["error"])
+            if batch["ids"]:
+                collection.upsert(
+                    ids=batch["ids"],
+                    embeddings=batch["embeddings"],
+                    documents=batch["documents"],
+                    metadatas=batch["metadatas"]
+                )
+                self.chunks += len(batch["ids"])
+                if self.on_write:
+                    self.on_write(len(batch["ids"]))
+        except Exception as e:
+            if not batch["error"]:
+                logger.error(f"Error escribiendo lote de {len(batch['ids'])} chunks: {e}")
+            self._failed.update(metadata["source"] for metadata in batch["metadatas"])
+            self._failed.update(batch["fresh"])
+
+        stale, entries = [], []
+        for prepared in batch["completed"]:
+            if prepared["path"] in self._failed:
+                self._failed.discard(prepared["path"])
+                self.errors += 1
+                continue
+            # El archivo encogió: borrar los chunks que sobran
+            current = set(prepared["ids"])
+            stale.extend(chunk_id for chunk_id in prepared["old_ids"] or [] if chunk_id not in current)
+            entries.append((prepared["path"], prepared["mtime"], prepared["size"], prepared["hash"], prepared["ids"]))
+            logger.debug(f"Indexado: {prepared['name']} ({len(prepared['ids'])} chunks)")
+
+        try:
+            if stale:
+                collection.delete(ids=stale)
+            if entries:
+                self.kb.manifest.put_many(entries)
+                self.files += len(entries)
+        except Exception as e:
+            logger.error(f"Error registrando {len(entries)} archivos indexados: {e}")
+            self.errors += len(entries)
+
+
 class KnowledgeBase:
     """
     Knowledge Base con búsqueda semántica.
@@ -36,14 +239,33 @@ class KnowledgeBase:
     # Modelo de embeddings (ligero y rápido)
     MODEL_NAME = "all-MiniLM-L6-v2"
     COLLECTION_NAME = "directos_knowledge"
-
-    def __init__(self, data_dir: Path):
+    # Chunks por lote de embeddings al indexar
+    BATCH_SIZE = 256
+    # Lotes embebidos esperando al escritor
+    WRITE_QUEUE_SIZE = 4
+    # Archivos en vuelo por proceso lector
+    READ_WINDOW_PER_WORKER = 8
+    # Por debajo de estos archivos a leer no compensa arrancar el pool
+    PARALLEL_MIN_FILES = 64
+    # Embeddings de queries recientes (LRU) que se reutilizan sin pasar por el modelo
+    QUERY_CACHE_SIZE = 1024
+
+    def __init__(self, data_dir: Path, batch_size: int = BATCH_SIZE, workers: int = None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
 
         self.model = None
         self.client = None
         self.collection = None
+        self.manifest = IndexManifest(self.data_dir / "manifest.db")
+
+        # query normalizada -> embedding, de menos a más reciente
+        self._query_cache: "OrderedDict[str, list[float]]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
 
         if DEPS_AVAILABLE:
             self._initialize()
@@ -76,117 +298,315 @@ class KnowledgeBase:
         return self.model is not None and self.collection is not None
 
     def _chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> list[str]:
+        """Dividir texto en chunks (ver modules.chunking.chunk_text)"""
+        return chunk_text(text, chunk_size, overlap)
+
+    def _remove_files(self, paths: list[str]) -> int:
+        """Borrar de la colección y del manifest archivos que ya no existen"""
+        chunk_ids = [chunk_id for path in paths for chunk_id in self.manifest.get(path)["chunk_ids"]]
+        if chunk_ids:
+            self.collection.delete(ids=chunk_ids)
+        self.manifest.remove(paths)
+        return len(chunk_ids)
+
+    def _scan_folder(
+        self,
+        folder: Path,
+        patterns: list[str],
+        cancel: threading.Event = None
+    ) -> list[Path]:
+        """Archivos de una carpeta que encajan con patterns (sin ocultos ni node_modules)"""
+        files = []
+        for root, dirs, names in os.walk(folder):
+            if cancel and cancel.is_set():
+                break
+            # Podar aquí evita recorrer .git, node_modules, etc.
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d != 'node_modules']
+            for name in names:
+                if not name.startswith('.') and any(fnmatch(name, pattern) for pattern in patterns):
+                    files.append(Path(root) / name)
+        return files
+
+    def _read_files(
+        self,
+        files: list[tuple[str, Optional[dict]]],
+        force: bool,
+        workers: int
+    ) -> Iterator[tuple[str, dict]]:
+        """
+        Etapa lectora: prepare_file de cada (path, entrada del manifest).
+
+        Con pocos archivos lee en este hilo; si no, en un pool de procesos
+        con como mucho READ_WINDOW_PER_WORKER archivos en vuelo por proceso,
+        que hace de cola acotada hacia la etapa de embeddings.
+        """
+        if workers <= 1 or len(files) < self.PARALLEL_MIN_FILES:
+            for path, entry in files:
+                yield prepare_file(path, entry, force)
+            return
+
+        # spawn: los lectores no heredan hilos ni locks del servidor. Solo
+        # importan modules.chunking, salvo que __main__ sea un script: ese lo
+        # vuelven a ejecutar (por eso main.py no es nunca __main__ del servidor)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            remaining = iter(files)
+            in_flight = deque(
+                pool.submit(prepare_file, path, entry, force)
+                for path, entry in islice(remaining, workers * self.READ_WINDOW_PER_WORKER)
+            )
+            while in_flight:
+                result = in_flight.popleft().result()
+                for path, entry in islice(remaining, 1):
+                    in_flight.append(pool.submit(prepare_file, path, entry, force))
+                yield result
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _index_files(
+        self,
+        files: Iterable[Path],
+        force: bool,
+        batch_size: int,
+        workers: int,
+        progress: dict = None,
+        report: Callable[[], None] = None,
+        cancel: threading.Event = None
+    ) -> dict:
         """
-        Dividir texto en chunks para mejor indexación.
+        Pipeline lectores → embeddings → escritor sobre una lista de archivos.
 
         Args:
-            text: Texto completo
-            chunk_size: Tamaño aproximado de cada chunk (caracteres)
-            overlap: Solapamiento entre chunks
+            progress: Contadores files_done y chunks que se van actualizando
+            report: Se llama tras cada archivo y cada lote escrito
+            cancel: Si se activa, se deja de leer y de embeber; los lotes ya
+                embebidos se escriben y los archivos a medias se reintentan
+                en la próxima indexación
 
         Returns:
-            Lista de chunks
+            Resumen: changed, unchanged, errors, chunks, batches, cancelled
         """
-        # Dividir por párrafos primero
-        paragraphs = re.split(r'\n\n+', text)
-
-        chunks = []
-        current_chunk = ""
-
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-
-            if len(current_chunk) + len(para) < chunk_size:
-                current_chunk += para + "\n\n"
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = para + "\n\n"
+        stats = {"changed": 0, "unchanged": 0, "errors": 0, "chunks": 0, "batches": 0, "cancelled": False}
+        progress = progress if progress is not None else {"files_done": 0, "chunks": 0}
+        report = report or (lambda: None)
+
+        def file_done():
+            progress["files_done"] += 1
+            report()
+
+        def chunks_written(count: int):
+            progress["chunks"] += count
+            report()
+
+        # Camino rápido en este hilo: mtime y tamaño iguales → ni se lee
+        to_read = []
+        for file_path in files:
+            if cancel and cancel.is_set():
+                stats["cancelled"] = True
+                return stats
+            path = str(file_path)
+            entry = self.manifest.get(path)
+            if entry and not force:
+                try:
+                    stat = file_path.stat()
+                except OSError as e:
+                    logger.error(f"Error indexando {path}: {e}")
+                    stats["errors"] += 1
+                    file_done()
+                    continue
+                if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    stats["unchanged"] += 1
+                    file_done()
+                    continue
+            to_read.append((path, entry))
 
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        if not to_read:
+            return stats
 
-        return chunks
+        writer = ChunkWriter(self, on_write=chunks_written)
+        batches: queue.Queue = queue.Queue(maxsize=self.WRITE_QUEUE_SIZE)
+        writer_thread = threading.Thread(target=writer.run, args=(batches,), name="kb-writer", daemon=True)
+        writer_thread.start()
+        batcher = EmbeddingBatcher(self.model, batch_size, sink=batches.put)
 
-    def index_file(self, file_path: Path) -> int:
+        try:
+            with closing(self._read_files(to_read, force, workers)) as results:
+                for status, data in results:
+                    if cancel and cancel.is_set():
+                        stats["cancelled"] = True
+                        break
+                    self._handle_read(status, data, batcher, stats)
+                    file_done()
+                else:
+                    batcher.flush()
+        finally:
+            batches.put(None)
+            writer_thread.join()
+
+        stats["changed"] = writer.files
+        stats["errors"] += writer.errors
+        stats["chunks"] = writer.chunks
+        stats["batches"] = batcher.batches
+        return stats
+
+    def _handle_read(self, status: str, data: dict, batcher: EmbeddingBatcher, stats: dict):
+        """Resultado de la etapa lectora para un archivo"""
+        if status == "changed":
+            batcher.add(data)
+        elif status == "unchanged":
+            stats["unchanged"] += 1
+            # Solo cambió el mtime: actualizarlo para no volver a hashear
+            entry = self.manifest.get(data["path"])
+            if entry and data["hash"]:
+                self.manifest.put(data["path"], data["mtime"], data["size"], data["hash"], entry["chunk_ids"])
+        else:
+            logger.error(f"Error indexando {data['path']}: {data['error']}")
+            stats["errors"] += 1
+
+    def index_file(self, file_path: Path, force: bool = False) -> int:
         """
-        Indexar un archivo markdown.
+        Indexar un archivo markdown (si cambió desde la última indexación).
+
+        Args:
+            file_path: Ruta al archivo
+            force: Re-embeber aunque no haya cambiado
 
         Returns:
-            Número de chunks indexados
+            Número de chunks indexados (0 si no cambió)
         """
         if not self.is_ready():
             return 0
 
-        file_path = Path(file_path)
+        file_path = Path(file_path).resolve()
         if not file_path.exists() or file_path.suffix not in ['.md', '.txt']:
             return 0
 
-        try:
-            text = file_path.read_text(encoding='utf-8')
-            chunks = self._chunk_text(text)
-
-            if not chunks:
-                return 0
-
-            # Generar embeddings
-            embeddings = self.model.encode(chunks).tolist()
-
-            # Preparar datos para ChromaDB
-            ids = [f"{file_path.stem}_{i}" for i in range(len(chunks))]
-            metadatas = [{"source": str(file_path), "chunk": i} for i in range(len(chunks))]
-
-            # Añadir a la colección
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=chunks,
-                metadatas=metadatas
-            )
-
-            logger.info(f"Indexado: {file_path.name} ({len(chunks)} chunks)")
-            return len(chunks)
-
-        except Exception as e:
-            logger.error(f"Error indexando {file_path}: {e}")
-            return 0
-
-    def index_folder(self, folder_path: str, patterns: list[str] = None) -> int:
+        return self._index_files([file_path], force, self.batch_size, workers=1)["chunks"]
+
+    def index_folder(
+        self,
+        folder_path: str,
+        patterns: list[str] = None,
+        force: bool = False,
+        batch_size: int = None,
+        workers: int = None,
+        on_progress: Callable[[dict], None] = None,
+        cancel: threading.Event = None
+    ) -> dict:
         """
-        Indexar todos los archivos markdown de una carpeta.
+        Indexar (incrementalmente) todos los archivos markdown de una carpeta.
+
+        Solo se re-embeben los archivos nuevos o modificados; los chunks de
+        archivos borrados de la carpeta se eliminan de la colección.
 
         Args:
             folder_path: Ruta a la carpeta
-            patterns: Patrones de archivos a incluir (default: *.md)
+            patterns: Patrones de archivos a incluir (default: *.md, *.txt)
+            force: Re-embeber todos los archivos aunque no hayan cambiado
+            batch_size: Chunks por lote de embeddings (default: self.batch_size)
+            workers: Procesos lectores (default: self.workers)
+            on_progress: Callback (desde los hilos de indexación) con
+                {"phase", "files_total", "files_done", "chunks"}
+            cancel: Event para cancelar; devuelve lo hecho hasta entonces
+                con cancelled=True y no borra archivos desaparecidos
 
         Returns:
-            Total de chunks indexados
+            Resumen: files (encontrados), changed (re-embebidos), unchanged,
+            removed, errors, chunks (indexados en esta pasada), batches
+            y cancelled
         """
+        stats = {
+            "files": 0, "changed": 0, "unchanged": 0, "removed": 0,
+            "errors": 0, "chunks": 0, "batches": 0, "cancelled": False
+        }
+        progress = {"phase": "scanning", "files_total": 0, "files_done": 0, "chunks": 0}
+
+        def report():
+            if on_progress:
+                on_progress(dict(progress))
+
         if not self.is_ready():
-            return 0
+            return stats
 
-        folder = Path(folder_path)
+        folder = Path(folder_path).expanduser().resolve()
         if not folder.exists():
             logger.warning(f"Carpeta no existe: {folder_path}")
-            return 0
+            return stats
 
         patterns = patterns or ["*.md", "*.txt"]
-        total = 0
-
-        for pattern in patterns:
-            for file_path in folder.rglob(pattern):
-                # Ignorar archivos ocultos y node_modules
-                if any(part.startswith('.') for part in file_path.parts):
-                    continue
-                if 'node_modules' in file_path.parts:
-                    continue
-
-                total += self.index_file(file_path)
+        report()
+        files = self._scan_folder(folder, patterns, cancel)
+        stats["files"] = progress["files_total"] = len(files)
+        progress["phase"] = "indexing"
+        report()
+
+        if cancel and cancel.is_set():
+            stats["cancelled"] = True
+        else:
+            stats.update(self._index_files(
+                files, force, batch_size or self.batch_size, workers or self.workers,
+                progress=progress, report=report, cancel=cancel
+            ))
+        if stats["cancelled"]:
+            logger.info(f"Indexación cancelada en {folder}: {stats['changed']} archivos indexados")
+            return stats
+
+        progress["phase"] = "cleanup"
+        report()
+
+        # Archivos del manifest (de estos patrones) que ya no están en la carpeta
+        seen = {str(f) for f in files}
+        removed = [
+            path for path in self.manifest.paths_under(folder)
+            if path not in seen and any(fnmatch(Path(path).name, pattern) for pattern in patterns)
+        ]
+        if removed:
+            self._remove_files(removed)
+            stats["removed"] = len(removed)
+
+        logger.info(
+            f"Indexación completada en {folder}: {stats['changed']} archivos indexados "
+            f"({stats['chunks']} chunks, {stats['batches']} lotes), {stats['unchanged']} sin cambios, "
+            f"{stats['removed']} eliminados"
+        )
+        return stats
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """
+        Clave de caché de una query: espacios colapsados y minúsculas
+        (all-MiniLM-L6-v2 es uncased: el embedding no cambia).
+        """
+        return " ".join(query.split()).lower()
 
-        logger.info(f"Indexación completada: {total} chunks de {folder_path}")
-        return total
+    def _embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """
+        Embeddings de varias queries: las que están en la caché LRU se
+        reutilizan y el resto se embeben juntas en una sola llamada al modelo.
+        """
+        keys = [self._normalize_query(query) for query in queries]
+        embeddings: dict[str, list[float]] = {}
+
+        with self._query_cache_lock:
+            for key in keys:
+                if key in self._query_cache:
+                    self._query_cache.move_to_end(key)
+                    embeddings[key] = self._query_cache[key]
+
+        missing = list(dict.fromkeys(key for key in keys if key not in embeddings))
+        if missing:
+            encoded = self.model.encode(missing).tolist()
+            embeddings.update(zip(missing, encoded))
+            with self._query_cache_lock:
+                for key, embedding in zip(missing, encoded):
+                    self._query_cache[key] = embedding
+                while len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+
+        with self._query_cache_lock:
+            self.query_cache_misses += len(missing)
+            self.query_cache_hits += len(keys) - len(missing)
+        return [embeddings[key] for key in keys]
 
     def search(self, query: str, limit: int = 5) -> list[dict]:
         """
@@ -199,34 +619,53 @@ class KnowledgeBase:
         Returns:
             Lista de resultados con text, source, score
         """
-        if not self.is_ready():
-            return []
+        return self.search_batch([query], limit)[0]
+
+    def search_batch(self, queries: list[str], limit: int = 5) -> list[list[dict]]:
+        """
+        Búsqueda semántica de varias queries a la vez.
+
+        Todas las queries se embeben en una llamada al modelo (menos las que
+        ya están en caché) y se buscan con una sola consulta a ChromaDB.
+
+        Args:
+            queries: Textos de búsqueda
+            limit: Número máximo de resultados por query
+
+        Returns:
+            Una lista de resultados (text, source, score) por query, en orden
+        """
+        if not self.is_ready() or not queries:
+            return [[] for _ in queries]
 
         try:
-            # Generar embedding de la query
-            query_embedding = self.model.encode([query]).tolist()
+            # Embeddings de las queries (caché + un solo encode)
+            query_embeddings = self._embed_queries(queries)
 
             # Buscar en ChromaDB
             results = self.collection.query(
-                query_embeddings=query_embedding,
+                query_embeddings=query_embeddings,
                 n_results=limit,
                 include=["documents", "metadatas", "distances"]
             )
 
             # Formatear resultados
             formatted = []
-            for i, doc in enumerate(results['documents'][0]):
-                formatted.append({
-                    "text": doc,
-                    "source": results['metadatas'][0][i].get('source', 'unknown'),
-                    "score": 1 - results['distances'][0][i]  # Convertir distancia a similitud
-                })
+            for q, documents in enumerate(results['documents']):
+                formatted.append([
+                    {
+                        "text": doc,
+                        "source": results['metadatas'][q][i].get('source', 'unknown'),
+                        "score": 1 - results['distances'][q][i]  # Convertir distancia a similitud
+                    }
+                    for i, doc in enumerate(documents)
+                ])
 
             return formatted
 
         except Exception as e:
             logger.error(f"Error en búsqueda: {e}")
-            return []
+            return [[] for _ in queries]
 
     def get_stats(self) -> dict:
         """Obtener estadísticas de la knowledge base"""
@@ -236,7 +675,13 @@ class KnowledgeBase:
         return {
             "ready": True,
             "count": self.collection.count(),
+            "files": len(self.manifest),
             "model": self.MODEL_NAME,
+            "query_cache": {
+                "size": len(self._query_cache),
+                "hits": self.query_cache_hits,
+                "misses": self.query_cache_misses
+            },
             "path": str(self.data_dir)
         }
 
@@ -248,4 +693,5 @@ class KnowledgeBase:
                 name=self.COLLECTION_NAME,
                 metadata={"hnsw:space": "cosine"}
             )
+            self.manifest.clear()
             logger.info("Knowledge Base limpiada")
@@ -0,0 +1,223 @@
+"""
+Node Cache - DirectOS v9.0 Agent Mode
+=====================================
+Caché de resultados de nodos direccionada por contenido.
+
+Si un nodo se ejecuta con el mismo tool, el mismo comando y los mismos
+archivos de entrada que una ejecución anterior con éxito, se restauran
+su output y sus artefactos en vez de volver a ejecutarlo.
+
+Clave:
+    sha256(tool + comando renderizado + sha256 de cada input declarado)
+
+Estructura en disco:
+    {cache_dir}/{key}/meta.json      → stdout/stderr y lista de artefactos
+    {cache_dir}/{key}/artifacts/...  → copias de los outputs declarados
+
+La expulsión es LRU por tamaño total (max_bytes). El executor la usa desde
+varios hilos (asyncio.to_thread): índice y directorios de entradas van
+protegidos por un lock.
+"""
+
+import hashlib
+import json
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+from loguru import logger
+
+
+class NodeCache:
+    """
+    Caché LRU de resultados de nodos.
+
+    Uso:
+        cache = NodeCache(cache_dir=work_dir / "_cache", max_bytes=1 << 30)
+        key = cache.make_key("ffmpeg", cmd, [run_dir / "audio.mp3"])
+        entry = cache.restore(key, run_dir)
+        if entry is None:
+            ...  # ejecutar y luego cache.store(key, run_dir, outputs, stdout, stderr)
+    """
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        # key -> tamaño en bytes, ordenado de menos a más reciente
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        """Reconstruye el índice LRU a partir de lo que hay en disco"""
+        found = []
+        for entry_dir in self.cache_dir.iterdir():
+            meta = entry_dir / "meta.json"
+            if not meta.exists():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            found.append((meta.stat().st_mtime, entry_dir.name, self._dir_size(entry_dir)))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+
+        if found:
+            logger.info(f"NodeCache: {len(found)} entradas ({self.total_bytes / 1e6:.1f} MB)")
+
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._entries.values())
+
+    def _hash_file(self, path: Path) -> str:
+        """sha256 de un archivo (o de todos los archivos de un directorio)"""
+        digest = hashlib.sha256()
+        files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            digest.update(str(file.relative_to(path) if path.is_dir() else "").encode())
+            with open(file, "rb") as f:
+                for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def make_key(self, tool: str, command: str, inputs: List[Path]) -> Optional[str]:
+        """
+        Calcula la clave de un nodo.
+
+        Returns:
+            Hash hex, o None si falta algún input (no se puede cachear)
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{tool}\0{command}\0".encode())
+        for path in inputs:
+            if not path.exists():
+                return None
+            digest.update(f"{path.name}\0{self._hash_file(path)}\0".encode())
+        return digest.hexdigest()
+
+    def restore(self, key: str, run_dir: Path) -> Optional[Dict]:
+        """
+        Copia los artefactos cacheados a run_dir.
+
+        Returns:
+            meta de la entrada (stdout, stderr, artifacts) o None si no existe
+            o está dañada (en ese caso se descarta)
+        """
+        entry_dir = self.cache_dir / key
+        meta_path = entry_dir / "meta.json"
+        with self._lock:
+            if key not in self._entries or not meta_path.exists():
+                self.misses += 1
+                return None
+
+            try:
+                meta = json.loads(meta_path.read_text())
+                for rel in meta.get("artifacts", []):
+                    src = entry_dir / "artifacts" / rel
+                    dst = run_dir / rel
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    if src.is_dir():
+                        shutil.copytree(src, dst, dirs_exist_ok=True)
+                    else:
+                        shutil.copy2(src, dst)
+                # Marcar como usada recientemente
+                meta_path.touch()
+            except (OSError, ValueError) as e:
+                logger.warning(f"NodeCache: entrada {key[:12]} dañada, se descarta: {e}")
+                self._entries.pop(key, None)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return meta
+
+    def store(self, key: str, run_dir: Path, outputs: List[str], stdout: str, stderr: str) -> bool:
+        """Guarda el resultado de un nodo con éxito y aplica la expulsión LRU"""
+        run_dir = run_dir.resolve()
+        tmp_dir = self.cache_dir / f".tmp_{key}_{int(time.time() * 1000)}"
+        artifacts = []
+
+        try:
+            for rel in outputs:
+                src = (run_dir / rel).resolve()
+                if run_dir not in src.parents or not src.exists():
+                    logger.warning(f"NodeCache: output ignorado {rel}")
+                    continue
+                rel_path = src.relative_to(run_dir)
+                dst = tmp_dir / "artifacts" / rel_path
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                if src.is_dir():
+                    shutil.copytree(src, dst)
+                else:
+                    shutil.copy2(src, dst)
+                artifacts.append(str(rel_path))
+
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            (tmp_dir / "meta.json").write_text(json.dumps({
+                "stdout": stdout,
+                "stderr": stderr,
+                "artifacts": artifacts,
+                "created_at": time.time()
+            }))
+            size = self._dir_size(tmp_dir)
+
+            with self._lock:
+                # Reemplazo atómico de la entrada
+                entry_dir = self.cache_dir / key
+                self._entries.pop(key, None)
+                if entry_dir.exists():
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                tmp_dir.rename(entry_dir)
+
+                self._entries[key] = size
+                self._entries.move_to_end(key)
+                self._evict()
+
+        except Exception as e:
+            logger.error(f"NodeCache: error guardando {key[:12]}: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        return True
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta caber en max_bytes (con el lock tomado)"""
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+            total -= size
+            logger.debug(f"NodeCache: expulsada {key[:12]} ({size} bytes)")
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            for key in list(self._entries):
+                shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Estadísticas de la caché"""
+        with self._lock:
+            entries, total = len(self._entries), sum(self._entries.values())
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,274 @@
+"""
+Ollama Client - DirectOS v9.0 Agent Mode
+========================================
+Cliente HTTP asíncrono para el servidor local de ollama (/api/generate).
+
+Sustituye a `ollama run` por nodo, que relanza el CLI y no puede agrupar
+peticiones:
+- Conexiones HTTP/1.1 keep-alive reutilizadas entre nodos (pool acotado)
+- keep_alive en cada petición para que el modelo siga cargado entre nodos
+- generate_many() lanza varios prompts a la vez; el servidor los agrupa
+  en el mismo modelo cargado (OLLAMA_NUM_PARALLEL)
+- Respuesta en streaming (NDJSON): cada token llega a on_token según se genera
+
+Solo usa la librería estándar (asyncio streams); base_url apunta a cualquier
+servidor compatible, p.ej. un stub local para pruebas.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from loguru import logger
+
+
+class OllamaError(RuntimeError):
+    """El servidor de ollama respondió con error o cortó la conexión"""
+
+
+class OllamaClient:
+    """
+    Cliente de ollama con pool de conexiones keep-alive.
+
+    Uso:
+        ollama = OllamaClient(base_url="http://127.0.0.1:11434", max_connections=4)
+        result = await ollama.generate("llama3", "Resume esto...", on_token=print)
+        results = await ollama.generate_many("llama3", ["a", "b", "c"])
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:11434",
+        max_connections: int = 4,
+        keep_alive: str = "10m",
+        connect_timeout: float = 10.0
+    ):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 11434
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+
+        self._idle: deque = deque()  # (reader, writer) listos para reutilizar
+        self._slots: Optional[asyncio.Semaphore] = None  # se crea dentro del event loop
+        self.requests = 0
+        self.connections_opened = 0
+        self.tokens = 0
+
+    # ========================================
+    # Conexiones
+    # ========================================
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Conexión reutilizada si hay alguna viva; si no, una nueva"""
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.connect_timeout
+        )
+        self.connections_opened += 1
+        return reader, writer, False
+
+    def _release(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, reusable: bool):
+        if reusable and not writer.is_closing():
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    # ========================================
+    # HTTP
+    # ========================================
+
+    async def _post_stream(self, path: str, payload: Dict) -> AsyncIterator[Dict]:
+        """POST con cuerpo JSON; devuelve cada línea NDJSON de la respuesta según llega"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+
+        body = json.dumps(payload).encode()
+        request = (
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode() + body
+
+        async with self._slots:
+            self.requests += 1
+            for attempt in range(2):
+                reader, writer, reused = await self._connect()
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    status_line = await reader.readline()
+                    if not status_line:
+                        raise ConnectionResetError("conexión cerrada por el servidor")
+                except (ConnectionError, OSError):
+                    writer.close()
+                    if reused and attempt == 0:
+                        logger.debug("OllamaClient: conexión keep-alive caducada, reconectando")
+                        continue  # keep-alive caducado: reintentar con conexión nueva
+                    raise
+                break
+
+            reusable = False
+            try:
+                status, headers = await self._read_head(status_line, reader)
+                chunks = self._read_body(reader, headers)
+                if status >= 400:
+                    detail = b"".join([chunk async for chunk in chunks]).decode(errors="replace")
+                    raise OllamaError(f"HTTP {status}: {detail[:500]}")
+
+                pending = b""
+                async for chunk in chunks:
+                    *lines, pending = (pending + chunk).split(b"\n")
+                    for line in lines:
+                        if line.strip():
+                            yield json.loads(line)
+                if pending.strip():
+                    yield json.loads(pending)
+
+                reusable = headers.get("connection", "").lower() != "close" and (
+                    "content-length" in headers or "chunked" in headers.get("transfer-encoding", "")
+                )
+            finally:
+                # Si el consumidor abandona a mitad la conexión no se puede reutilizar
+                self._release(reader, writer, reusable)
+
+    @staticmethod
+    async def _read_head(status_line: bytes, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise OllamaError(f"Respuesta HTTP inválida: {status_line[:100]!r}")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        """Cuerpo por trozos: chunked, Content-Length o hasta EOF"""
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Trailers opcionales hasta la línea vacía
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                try:
+                    yield await reader.readexactly(size)
+                    await reader.readexactly(2)  # \r\n tras cada trozo
+                except asyncio.IncompleteReadError:
+                    raise OllamaError("Respuesta truncada")
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                chunk = await reader.read(min(remaining, 65536))
+                if not chunk:
+                    raise OllamaError("Respuesta truncada")
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while chunk := await reader.read(65536):
+                yield chunk
+
+    # ========================================
+    # API
+    # ========================================
+
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        options: Dict = None,
+        system: str = None,
+        on_token: Callable[[str], None] = None
+    ) -> Dict:
+        """
+        Genera una respuesta en streaming.
+
+        Returns:
+            Último mensaje del servidor (eval_count, total_duration...) con
+            "response" completo
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        if system:
+            payload["system"] = system
+
+        parts: List[str] = []
+        final: Dict = {}
+        started = time.time()
+        async with aclosing(self._post_stream("/api/generate", payload)) as messages:
+            async for message in messages:
+                if message.get("error"):
+                    raise OllamaError(message["error"])
+                token = message.get("response", "")
+                if token:
+                    parts.append(token)
+                    self.tokens += 1
+                    if on_token:
+                        on_token(token)
+                if message.get("done"):
+                    final = message
+
+        final["response"] = "".join(parts)
+        final.setdefault("total_duration", int((time.time() - started) * 1e9))
+        return final
+
+    async def generate_many(
+        self,
+        model: str,
+        prompts: List[str],
+        options: Dict = None,
+        system: str = None,
+        on_token: Callable[[int, str], None] = None
+    ) -> List[Dict]:
+        """
+        Lanza varios prompts a la vez (hasta max_connections en vuelo).
+
+        on_token recibe (índice del prompt, token). El orden de los
+        resultados es el de prompts.
+        """
+        def token_callback(index: int):
+            return (lambda token: on_token(index, token)) if on_token else None
+
+        return await asyncio.gather(*[
+            self.generate(model, prompt, options, system, token_callback(i))
+            for i, prompt in enumerate(prompts)
+        ])
+
+    async def close(self):
+        """Cierra las conexiones ociosas"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    def get_stats(self) -> Dict:
+        """Estadísticas del cliente"""
+        return {
+            "base_url": self.base_url,
+            "max_connections": self.max_connections,
+            "idle_connections": len(self._idle),
+            "connections_opened": self.connections_opened,
+            "requests": self.requests,
+            "tokens": self.tokens
+        }
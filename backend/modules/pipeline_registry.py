@@ -0,0 +1,244 @@
+"""
+Pipeline Registry - DirectOS v9.0 Agent Mode
+============================================
+Pipelines guardados, para lanzarlos por id desde schedules y watches
+(ScheduledTask.pipeline_id, WatchConfig.pipeline_id) o desde la API.
+
+Cada guardado crea una versión nueva y conserva las anteriores. La
+definición se valida y su orden de ejecución se compila una sola vez, al
+guardar; cada disparo usa la versión ya compilada sin volver a parsear
+ni validar nada.
+
+Tablas:
+- pipelines:         id, nombre y versión actual
+- pipeline_versions: definición JSON y orden de ejecución de cada versión
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pipelines (
+    id         TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    version    INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pipeline_versions (
+    pipeline_id     TEXT NOT NULL REFERENCES pipelines(id) ON DELETE CASCADE,
+    version         INTEGER NOT NULL,
+    definition      TEXT NOT NULL,
+    execution_order TEXT NOT NULL,
+    created_at      REAL NOT NULL,
+    PRIMARY KEY (pipeline_id, version)
+);
+"""
+
+
+@dataclass
+class SavedPipeline:
+    """Una versión de un pipeline guardado, ya validada y compilada"""
+    id: str
+    name: str
+    version: int
+    definition: Dict
+    execution_order: List[str]
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self, include_definition: bool = True) -> Dict:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "version": self.version,
+            "nodes": len(self.definition.get("nodes", [])),
+            "execution_order": self.execution_order,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+        if include_definition:
+            data["definition"] = self.definition
+        return data
+
+
+class PipelineRegistry:
+    """
+    Registro versionado de pipelines en SQLite.
+
+    Uso:
+        registry = PipelineRegistry(DATA_DIR / "agent" / "pipelines.db", compiler=executor.compile_pipeline)
+        saved = registry.save({"name": "OCR", "nodes": [...], "connections": [...]})
+        saved = registry.get(saved.id)
+        run_id = await executor.execute(saved.definition, execution_order=saved.execution_order)
+
+    compiler(definition) valida la definición y devuelve su orden de
+    ejecución; lanza ValueError (PipelineCycleError incluido) si no es válida.
+    """
+
+    # Versiones antiguas que se mantienen compiladas en memoria
+    MAX_CACHED_VERSIONS = 64
+
+    def __init__(self, db_path: Path, compiler: Callable[[Dict], List[str]]):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.compiler = compiler
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+        # Versión actual de cada pipeline, lista para lanzar
+        self._current: Dict[str, SavedPipeline] = {}
+        # (id, versión) -> versiones anteriores pedidas explícitamente
+        self._versions: Dict[Tuple[str, int], SavedPipeline] = {}
+        self._load()
+
+        logger.info(f"PipelineRegistry inicializado. Pipelines: {len(self._current)}")
+
+    def _load(self):
+        """Carga la versión actual de cada pipeline (ya compilada en la base de datos)"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT p.id, p.name, p.version, p.created_at, p.updated_at, v.definition, v.execution_order
+                FROM pipelines p JOIN pipeline_versions v ON v.pipeline_id = p.id AND v.version = p.version
+                """
+            ).fetchall()
+        for row in rows:
+            self._current[row["id"]] = self._from_row(row)
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> SavedPipeline:
+        return SavedPipeline(
+            id=row["id"],
+            name=row["name"],
+            version=row["version"],
+            definition=json.loads(row["definition"]),
+            execution_order=json.loads(row["execution_order"]),
+            created_at=row["created_at"],
+            updated_at=row["updated_at"]
+        )
+
+    def save(self, definition: Dict, pipeline_id: str = None) -> SavedPipeline:
+        """
+        Crea un pipeline o guarda una versión nueva de uno existente.
+
+        Raises:
+            ValueError: si la definición no es válida (nada se guarda)
+        """
+        order = self.compiler(definition)
+        now = time.time()
+        pipeline_id = pipeline_id or f"pipeline_{uuid.uuid4().hex[:8]}"
+        previous = self._current.get(pipeline_id)
+        name = definition.get("name") or (previous.name if previous else "Unnamed Pipeline")
+
+        saved = SavedPipeline(
+            id=pipeline_id,
+            name=name,
+            version=previous.version + 1 if previous else 1,
+            definition={**definition, "name": name},
+            execution_order=order,
+            created_at=previous.created_at if previous else now,
+            updated_at=now
+        )
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO pipelines (id, name, version, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    name = excluded.name, version = excluded.version, updated_at = excluded.updated_at
+                """,
+                (saved.id, saved.name, saved.version, saved.created_at, saved.updated_at)
+            )
+            self._conn.execute(
+                "INSERT INTO pipeline_versions VALUES (?, ?, ?, ?, ?)",
+                (saved.id, saved.version, json.dumps(saved.definition), json.dumps(order), now)
+            )
+
+        if previous:
+            self._cache_version(previous)
+        self._current[pipeline_id] = saved
+        logger.info(f"Pipeline guardado: {saved.id} v{saved.version} ({saved.name})")
+        return saved
+
+    def _cache_version(self, saved: SavedPipeline):
+        self._versions[(saved.id, saved.version)] = saved
+        while len(self._versions) > self.MAX_CACHED_VERSIONS:
+            self._versions.pop(next(iter(self._versions)))
+
+    def get(self, pipeline_id: str, version: int = None) -> Optional[SavedPipeline]:
+        """Versión actual (o una concreta) de un pipeline"""
+        current = self._current.get(pipeline_id)
+        if not current or version is None or version == current.version:
+            return current
+
+        cached = self._versions.get((pipeline_id, version))
+        if cached:
+            return cached
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT p.id, p.name, v.version, p.created_at, v.created_at AS updated_at,
+                       v.definition, v.execution_order
+                FROM pipeline_versions v JOIN pipelines p ON p.id = v.pipeline_id
+                WHERE v.pipeline_id = ? AND v.version = ?
+                """,
+                (pipeline_id, version)
+            ).fetchone()
+        if not row:
+            return None
+        saved = self._from_row(row)
+        saved.name = saved.definition.get("name", saved.name)
+        self._cache_version(saved)
+        return saved
+
+    def list(self) -> List[SavedPipeline]:
+        """Versión actual de todos los pipelines, el último modificado primero"""
+        return sorted(self._current.values(), key=lambda p: p.updated_at, reverse=True)
+
+    def versions(self, pipeline_id: str) -> List[Dict]:
+        """Historial de versiones de un pipeline (sin definiciones)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, created_at, definition FROM pipeline_versions WHERE pipeline_id = ? ORDER BY version DESC",
+                (pipeline_id,)
+            ).fetchall()
+        return [
+            {
+                "version": row["version"],
+                "created_at": row["created_at"],
+                "name": json.loads(row["definition"]).get("name", ""),
+            }
+            for row in rows
+        ]
+
+    def delete(self, pipeline_id: str) -> bool:
+        """Borra un pipeline con todas sus versiones"""
+        if pipeline_id not in self._current:
+            return False
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pipelines WHERE id = ?", (pipeline_id,))
+        del self._current[pipeline_id]
+        for key in [k for k in self._versions if k[0] == pipeline_id]:
+            del self._versions[key]
+        logger.info(f"Pipeline eliminado: {pipeline_id}")
+        return True
+
+    def get_stats(self) -> Dict:
+        return {
+            "pipelines": len(self._current),
+            "cached_versions": len(self._versions)
+        }
@@ -0,0 +1,429 @@
+"""
+Python Worker Pool - DirectOS v9.0 Agent Mode
+=============================================
+Workers Python persistentes para nodos `python` marcados con config.warm.
+
+Cada worker es un intérprete que importa una vez los módulos declarados
+(numpy, torch, sentence_transformers...) y se queda esperando tareas.
+Por cada nodo hace fork: el hijo hereda los imports ya cargados, ejecuta
+el script con runpy como __main__ y termina. Así un nodo corto tarda
+decenas de milisegundos en vez de pagar arranque + imports cada vez,
+y cada script sigue aislado (globals, cwd, argv y memoria propios).
+
+Protocolo (socketpair Unix, JSON por línea):
+    executor → worker: {"script", "args", "cwd", "limits"} + fds stdin/stdout/stderr
+    worker → executor: {"ready"}, {"pid"} al hacer fork, {"exit", "rss_kb", "rusage"} al terminar
+
+El hijo abre su propia sesión, así que el executor lo trata como cualquier
+proceso: lee sus pipes, aplica timeouts y mata su grupo con os.killpg.
+
+Reciclado: un worker se reemplaza tras max_tasks nodos o si su RSS supera
+max_rss_mb (p.ej. por caches que crecen en los módulos precargados).
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from loguru import logger
+
+from modules.child_process import pipe_reader, pipe_writer, rusage_dict
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+class PooledProcess:
+    """
+    Nodo ejecutándose en un worker.
+
+    Imita la parte de asyncio.subprocess.Process que usa el executor:
+    pid, returncode, stdin/stdout/stderr y wait(); rusage (os.wait4 en el
+    worker) queda disponible al terminar.
+    """
+
+    def __init__(self, pid: int, stdin, stdout: asyncio.StreamReader, stderr: asyncio.StreamReader):
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self.rusage: Optional[Dict] = None
+        self._exited = asyncio.Event()
+
+    def _set_exit(self, code: int, rusage: Dict = None):
+        self.returncode = code
+        self.rusage = rusage
+        self._exited.set()
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        return self.returncode
+
+
+class _Worker:
+    """Lado del executor de un worker: proceso, socket de control y respuestas pendientes"""
+
+    def __init__(self, process: asyncio.subprocess.Process, sock: socket.socket):
+        self.process = process
+        self.sock = sock
+        self.tasks = 0
+        self.rss_kb = 0
+        self.alive = True
+        self.replies: deque = deque()  # futures en orden de llegada de mensajes
+        self.reader_task: Optional[asyncio.Task] = None
+
+    def expect(self) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.replies.append(future)
+        return future
+
+
+class PythonWorkerPool:
+    """
+    Pool de workers Python pre-arrancados.
+
+    Uso:
+        pool = PythonWorkerPool(size=2, preload=["numpy"])
+        process = await pool.spawn(["script.py", "--flag"], cwd=run_dir, limits=limits)
+        ...  # igual que un asyncio.subprocess.Process
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        preload: Sequence[str] = (),
+        max_tasks: int = 200,
+        max_rss_mb: int = 2048,
+        python: str = sys.executable
+    ):
+        self.size = size
+        self.preload = list(preload)
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        self.python = python
+
+        self._idle: List[_Worker] = []
+        self._workers: List[_Worker] = []
+        self._slots: Optional[asyncio.Semaphore] = None  # se crea dentro del event loop
+        self.tasks_run = 0
+        self.recycled = 0
+
+    # ========================================
+    # Ciclo de vida de los workers
+    # ========================================
+
+    async def _start_worker(self) -> _Worker:
+        """Arranca un worker y espera a que termine de precargar módulos"""
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.python, "-m", "modules.python_pool",
+                str(child_sock.fileno()), *self.preload,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+                pass_fds=(child_sock.fileno(),),
+                env=env
+            )
+        finally:
+            child_sock.close()
+
+        parent_sock.setblocking(False)
+        worker = _Worker(process, parent_sock)
+        ready = worker.expect()
+        worker.reader_task = asyncio.create_task(self._read_replies(worker))
+        hello = await ready
+        if hello.get("failed"):
+            logger.warning(f"PythonWorkerPool: no se pudieron precargar {hello['failed']}")
+        logger.info(f"PythonWorkerPool: worker {process.pid} listo")
+        self._workers.append(worker)
+        return worker
+
+    async def _read_replies(self, worker: _Worker):
+        """Resuelve, en orden, los futures pendientes con cada línea del worker"""
+        loop = asyncio.get_running_loop()
+        buffer = b""
+        try:
+            while True:
+                data = await loop.sock_recv(worker.sock, 65536)
+                if not data:
+                    break
+                buffer += data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    if worker.replies:
+                        future = worker.replies.popleft()
+                        if not future.done():
+                            future.set_result(json.loads(line))
+        except (OSError, ValueError) as e:
+            logger.error(f"PythonWorkerPool: canal del worker {worker.process.pid} roto: {e}")
+        finally:
+            worker.alive = False
+            while worker.replies:
+                future = worker.replies.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError("El worker Python terminó inesperadamente"))
+
+    async def _acquire(self) -> _Worker:
+        """Worker libre; arranca uno nuevo si no queda ninguno ocioso"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+                self._discard(worker)
+            return await self._start_worker()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: _Worker):
+        """Devuelve el worker al pool o lo recicla si toca"""
+        if not worker.alive:
+            self._discard(worker)
+        elif worker.tasks >= self.max_tasks or worker.rss_kb > self.max_rss_mb * 1024:
+            logger.info(
+                f"PythonWorkerPool: reciclando worker {worker.process.pid} "
+                f"({worker.tasks} tareas, {worker.rss_kb // 1024} MB)"
+            )
+            self.recycled += 1
+            self._discard(worker)
+        else:
+            self._idle.append(worker)
+        self._slots.release()
+
+    def _discard(self, worker: _Worker):
+        """Cierra el socket de control: el worker sale al ver EOF"""
+        if worker in self._workers:
+            self._workers.remove(worker)
+        worker.alive = False
+        if worker.sock.fileno() != -1:
+            asyncio.get_running_loop().remove_reader(worker.sock.fileno())
+            worker.sock.close()
+        if worker.reader_task:
+            worker.reader_task.cancel()
+
+    # ========================================
+    # Ejecución
+    # ========================================
+
+    async def spawn(
+        self,
+        argv: List[str],
+        cwd: Path,
+        limits: Dict = None,
+        stdin: bool = False
+    ) -> PooledProcess:
+        """
+        Ejecuta `python3 argv...` en un worker.
+
+        Args:
+            argv: script y sus argumentos
+            cwd: directorio de trabajo del script
+            limits: nice y rlimits (mismo formato que DEFAULT_LIMITS del executor)
+            stdin: crear un pipe de stdin (si no, /dev/null)
+        """
+        loop = asyncio.get_running_loop()
+        worker = await self._acquire()
+
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        if stdin:
+            in_r, in_w = os.pipe()
+        else:
+            in_r, in_w = os.open(os.devnull, os.O_RDONLY), None
+
+        started = worker.expect()
+        exited = worker.expect()
+        task = {"script": argv[0], "args": argv[1:], "cwd": str(cwd), "limits": limits or {}}
+        try:
+            socket.send_fds(worker.sock, [json.dumps(task).encode() + b"\n"], [in_r, out_w, err_w])
+        except OSError:
+            worker.alive = False
+            self._release(worker)
+            self._close_fds(in_w, out_r, err_r)
+            raise
+        finally:
+            # Los extremos del hijo ya viajaron al worker
+            self._close_fds(in_r, out_w, err_w)
+
+        worker.tasks += 1
+        self.tasks_run += 1
+
+        try:
+            reply = await asyncio.shield(started)
+        except asyncio.CancelledError:
+            # El hijo puede arrancar igualmente: matarlo en cuanto sepamos su pid
+            started.add_done_callback(lambda f: f.exception() or self._kill_group(f.result()["pid"]))
+            exited.add_done_callback(lambda f: self._finish(worker, f))
+            self._close_fds(in_w, out_r, err_r)
+            raise
+        except ConnectionError:
+            self._close_fds(in_w, out_r, err_r)
+            self._release(worker)
+            raise
+
+        stdout = await pipe_reader(out_r, loop)
+        stderr = await pipe_reader(err_r, loop)
+        writer = await pipe_writer(in_w, loop) if in_w is not None else None
+
+        process = PooledProcess(reply["pid"], writer, stdout, stderr)
+        exited.add_done_callback(lambda f: self._finish(worker, f, process))
+        return process
+
+    def _finish(self, worker: _Worker, future: asyncio.Future, process: PooledProcess = None):
+        """El hijo terminó: publicar el código de salida y liberar el worker"""
+        rusage = None
+        if future.cancelled() or future.exception():
+            code = -9
+        else:
+            reply = future.result()
+            code = reply["exit"]
+            rusage = reply.get("rusage")
+            worker.rss_kb = reply.get("rss_kb", 0)
+        if process:
+            process._set_exit(code, rusage)
+        self._release(worker)
+
+    @staticmethod
+    def _close_fds(*fds: Optional[int]):
+        for fd in fds:
+            if fd is not None:
+                os.close(fd)
+
+    @staticmethod
+    def _kill_group(pid: int):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def close(self):
+        """Detiene todos los workers"""
+        self._idle.clear()
+        for worker in list(self._workers):
+            self._discard(worker)
+            try:
+                await asyncio.wait_for(worker.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                worker.process.kill()
+
+    def get_stats(self) -> Dict:
+        """Estadísticas del pool"""
+        return {
+            "size": self.size,
+            "workers": len(self._workers),
+            "idle": len(self._idle),
+            "preload": self.preload,
+            "tasks_run": self.tasks_run,
+            "recycled": self.recycled
+        }
+
+
+# =============================================================================
+# LADO DEL WORKER (python -m modules.python_pool <fd> [módulos...])
+# =============================================================================
+
+def _current_rss_kb() -> int:
+    """RSS actual del worker (Linux); en otros sistemas el máximo histórico"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_child(task: Dict, fds: List[int], sock: socket.socket):
+    """Hijo tras el fork: sesión propia, stdio del nodo, límites y runpy"""
+    import runpy
+    import traceback
+    from modules.executor import DEFAULT_LIMITS, _child_limits
+
+    code = 1
+    try:
+        sock.close()
+        os.setsid()
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        _child_limits({**DEFAULT_LIMITS, **task["limits"]})()
+
+        os.chdir(task["cwd"])
+        script = os.path.abspath(task["script"])
+        sys.argv = [script] + list(task["args"])
+        sys.path[0] = os.path.dirname(script)
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code)
+
+
+def _worker_main(sock_fd: int, preload: List[str]):
+    import importlib
+
+    sock = socket.socket(fileno=sock_fd)
+    failed = []
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            failed.append(name)
+    # Los hijos deben heredar ya importado lo que usarán para aplicar límites
+    import modules.executor  # noqa: F401
+
+    def reply(message: Dict):
+        sock.sendall(json.dumps(message).encode() + b"\n")
+
+    reply({"ready": True, "failed": failed})
+    buffer = b""
+    while True:
+        data, fds, _, _ = socket.recv_fds(sock, 65536, 3)
+        if not data:
+            break
+        buffer += data
+        if b"\n" not in buffer:
+            continue
+        line, buffer = buffer.split(b"\n", 1)
+        task = json.loads(line)
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            _run_child(task, fds, sock)
+        for fd in fds:
+            os.close(fd)
+        reply({"pid": pid})
+        _, status, ru = os.wait4(pid, 0)
+        reply({"exit": os.waitstatus_to_exitcode(status), "rss_kb": _current_rss_kb(), "rusage": rusage_dict(ru)})
+
+
+if __name__ == "__main__":
+    _worker_main(int(sys.argv[1]), sys.argv[2:])
@@ -0,0 +1,279 @@
+"""
+Run Store - DirectOS v9.0 Agent Mode
+====================================
+Historial persistente de ejecuciones de pipelines en SQLite.
+
+Tablas:
+- runs:         un registro por run (estado, tiempos y to_dict() completo en JSON)
+- node_results: un registro por nodo ejecutado, con su rusage (para
+                estadísticas por tool)
+
+Índices sobre created_at, started_at, status y pipeline_name para que
+listar y filtrar cueste O(limit) aunque el historial crezca.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from loguru import logger
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id            TEXT PRIMARY KEY,
+    pipeline_name TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    created_at    REAL NOT NULL,
+    started_at    REAL NOT NULL DEFAULT 0,
+    finished_at   REAL NOT NULL DEFAULT 0,
+    data          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs(created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_pipeline ON runs(pipeline_name, created_at);
+
+CREATE TABLE IF NOT EXISTS node_results (
+    run_id      TEXT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    node_id     TEXT NOT NULL,
+    tool        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    started_at  REAL NOT NULL DEFAULT 0,
+    finished_at REAL NOT NULL DEFAULT 0,
+    duration    REAL NOT NULL DEFAULT 0,
+    cached      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, node_id)
+);
+CREATE INDEX IF NOT EXISTS idx_node_results_tool ON node_results(tool, status);
+"""
+
+# Columnas de rusage en node_results (se añaden a bases de datos anteriores)
+RUSAGE_COLUMNS = {
+    "user_cpu": "REAL",
+    "sys_cpu": "REAL",
+    "max_rss_kb": "INTEGER",
+    "read_blocks": "INTEGER",
+    "write_blocks": "INTEGER",
+    "voluntary_ctx": "INTEGER",
+    "involuntary_ctx": "INTEGER",
+}
+
+
+class RunStore:
+    """
+    Historial de runs en SQLite.
+
+    Uso:
+        store = RunStore(db_path=work_dir / "runs.db")
+        store.save_run(run.to_dict())
+        store.list_runs(limit=20, status="error")
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        logger.info(f"RunStore inicializado en {self.db_path}")
+
+    def _migrate(self):
+        """Añade las columnas de rusage que falten (NULL = sin datos)"""
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(node_results)")}
+        with self._conn:
+            for name, kind in RUSAGE_COLUMNS.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE node_results ADD COLUMN {name} {kind}")
+
+    def save_run(self, run: Dict):
+        """Inserta o actualiza un run (y sus nodos) a partir de PipelineRun.to_dict()"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO runs (id, pipeline_name, status, created_at, started_at, finished_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    status = excluded.status,
+                    started_at = excluded.started_at,
+                    finished_at = excluded.finished_at,
+                    data = excluded.data
+                """,
+                (
+                    run["id"], run["pipeline_name"], run["status"], run["created_at"],
+                    run["started_at"], run["finished_at"], json.dumps(run)
+                )
+            )
+            self._conn.executemany(
+                f"""
+                INSERT OR REPLACE INTO node_results
+                    (run_id, node_id, tool, status, started_at, finished_at, duration, cached,
+                     {", ".join(RUSAGE_COLUMNS)})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, {", ".join("?" for _ in RUSAGE_COLUMNS)})
+                """,
+                [
+                    (
+                        run["id"], n["id"], n["tool"], n["status"], n.get("started_at", 0),
+                        n.get("finished_at", 0), n["duration"], int(n.get("cached", False)),
+                        *[(n.get("rusage") or {}).get(name) for name in RUSAGE_COLUMNS]
+                    )
+                    for n in run["nodes"]
+                ]
+            )
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """Obtiene un run por id"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    @staticmethod
+    def _filters(status: str = None, pipeline_name: str = None, since: float = None):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if pipeline_name:
+            clauses.append("pipeline_name = ?")
+            params.append(pipeline_name)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def list_runs(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        status: str = None,
+        pipeline_name: str = None,
+        since: float = None
+    ) -> List[Dict]:
+        """Lista runs (más recientes primero) con filtros opcionales"""
+        where, params = self._filters(status, pipeline_name, since)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM runs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def count_runs(self, status: str = None, pipeline_name: str = None, since: float = None) -> int:
+        """Cuenta runs con los mismos filtros que list_runs"""
+        where, params = self._filters(status, pipeline_name, since)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM runs {where}", params).fetchone()[0]
+
+    def duration_stats(self, pipeline_name: str = None) -> Dict[str, Dict[str, Dict]]:
+        """
+        Duración media de los nodos que terminaron bien ejecutándose de verdad
+        (sin caché), para estimar cuánto tardará un pipeline.
+
+        Returns:
+            {"tools": {tool: {"avg", "max", "samples"}},
+             "nodes": {node_id: {...}}}  (nodes solo con pipeline_name)
+        """
+        where = "status = 'success' AND cached = 0 AND duration > 0"
+        query = f"SELECT tool AS key, AVG(duration), MAX(duration), COUNT(*) FROM node_results WHERE {where} GROUP BY tool"
+        with self._lock:
+            tools = self._conn.execute(query).fetchall()
+            nodes = self._conn.execute(
+                f"""
+                SELECT node_id AS key, AVG(duration), MAX(duration), COUNT(*) FROM node_results
+                WHERE {where} AND run_id IN (SELECT id FROM runs WHERE pipeline_name = ?)
+                GROUP BY node_id
+                """,
+                (pipeline_name,)
+            ).fetchall() if pipeline_name else []
+
+        def to_dict(rows):
+            return {row[0]: {"avg": row[1], "max": row[2], "samples": row[3]} for row in rows}
+        return {"tools": to_dict(tools), "nodes": to_dict(nodes)}
+
+    def tool_stats(self, since: float = None) -> List[Dict]:
+        """
+        Uso de recursos agregado por tool (nodos ejecutados de verdad, sin caché).
+
+        Returns:
+            Una entrada por tool, la que más CPU consume primero: nodos,
+            errores, duración media/total, CPU total y media por nodo, pico y
+            media de RSS, bloques de I/O y cambios de contexto
+        """
+        where, params = "cached = 0 AND status IN ('success', 'error')", []
+        if since:
+            where += " AND started_at >= ?"
+            params.append(since)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT tool,
+                       COUNT(*) AS nodes,
+                       SUM(status = 'error') AS errors,
+                       AVG(duration) AS avg_duration,
+                       SUM(duration) AS total_duration,
+                       COUNT(user_cpu) AS measured,
+                       SUM(user_cpu + sys_cpu) AS total_cpu,
+                       AVG(user_cpu + sys_cpu) AS avg_cpu,
+                       SUM(user_cpu) AS user_cpu,
+                       SUM(sys_cpu) AS sys_cpu,
+                       MAX(max_rss_kb) AS peak_rss_kb,
+                       AVG(max_rss_kb) AS avg_rss_kb,
+                       SUM(read_blocks) AS read_blocks,
+                       SUM(write_blocks) AS write_blocks,
+                       SUM(voluntary_ctx) AS voluntary_ctx,
+                       SUM(involuntary_ctx) AS involuntary_ctx
+                FROM node_results WHERE {where}
+                GROUP BY tool ORDER BY total_cpu IS NULL, total_cpu DESC
+                """,
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_interrupted(self, statuses: tuple = ("queued", "running")) -> List[str]:
+        """
+        Marca como 'interrupted' los runs que quedaron a medias en un reinicio.
+
+        Returns:
+            IDs de los runs afectados
+        """
+        placeholders = ",".join("?" for _ in statuses)
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"SELECT id, data FROM runs WHERE status IN ({placeholders})", statuses
+            ).fetchall()
+            for row in rows:
+                data = json.loads(row["data"])
+                data["status"] = "interrupted"
+                self._conn.execute(
+                    "UPDATE runs SET status = 'interrupted', data = ? WHERE id = ?",
+                    (json.dumps(data), row["id"])
+                )
+        return [row["id"] for row in rows]
+
+    def prune(self, max_age_seconds: float) -> List[str]:
+        """
+        Borra runs terminados más antiguos que max_age_seconds.
+
+        Returns:
+            IDs borrados (para limpiar también sus directorios)
+        """
+        cutoff = time.time() - max_age_seconds
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id FROM runs WHERE finished_at > 0 AND finished_at < ?", (cutoff,)
+            ).fetchall()
+            ids = [row["id"] for row in rows]
+            self._conn.executemany("DELETE FROM runs WHERE id = ?", [(i,) for i in ids])
+        return ids
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
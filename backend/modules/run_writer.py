@@ -0,0 +1,215 @@
+"""
+Run Writer - DirectOS v9.0 Agent Mode
+=====================================
+Hilo escritor para todo el I/O de disco del executor.
+
+El event loop nunca escribe: encola y sigue. El hilo vuelca por lotes
+cada flush_interval (o antes si un buffer crece mucho):
+- JSON (pipeline.json, checkpoint.json, result.json): compacto, escritura
+  atómica y coalescido por ruta (si llegan tres checkpoints seguidos del
+  mismo run, solo se escribe el último)
+- Operaciones arbitrarias coalescidas por clave (p.ej. RunStore.save_run
+  por run_id)
+- Archivos abiertos (logs de nodos, stdout capturado): write() solo añade
+  a un buffer en memoria; aclose() espera a que todo esté en disco
+
+    writer = RunWriter()
+    writer.write_json(run_dir / "result.json", run.to_dict())
+    log = writer.open(run_dir / "n1.log")
+    log.write("...")
+    await log.aclose()
+"""
+
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
+from loguru import logger
+
+
+class BufferedFile:
+    """Archivo cuyo contenido escribe el hilo del RunWriter"""
+
+    def __init__(self, writer: "RunWriter", path: Path, binary: bool):
+        self.path = Path(path)
+        self.binary = binary
+        self._writer = writer
+        self._chunks: List[Union[str, bytes]] = []
+        self._pending_bytes = 0
+        self._handle = None
+        self._closing: Optional[asyncio.Future] = None
+        self.closed = False
+
+    def write(self, data: Union[str, bytes]):
+        """Añade datos al buffer (no bloquea)"""
+        if self.closed:
+            raise ValueError(f"write() sobre {self.path} ya cerrado")
+        with self._writer._lock:
+            self._chunks.append(data)
+            self._pending_bytes += len(data)
+            self._writer._dirty[id(self)] = self
+        if self._pending_bytes > self._writer.max_buffer_bytes:
+            self._writer._wake.set()
+
+    async def aclose(self):
+        """Vuelca lo pendiente, cierra el archivo y espera a que esté en disco"""
+        if self.closed:
+            return
+        self.closed = True
+        future = asyncio.get_running_loop().create_future()
+        with self._writer._lock:
+            self._closing = future
+            self._writer._dirty[id(self)] = self
+        self._writer._wake.set()
+        await future
+
+    def _drain(self):
+        """(Hilo escritor) escribe el buffer y, si toca, cierra"""
+        with self._writer._lock:
+            chunks, self._chunks = self._chunks, []
+            self._pending_bytes = 0
+            closing = self._closing
+        try:
+            if self._handle is None:
+                self._handle = open(self.path, "wb" if self.binary else "w")
+            if chunks:
+                self._handle.write(b"".join(chunks) if self.binary else "".join(chunks))
+                self._handle.flush()
+        except OSError as e:
+            logger.error(f"RunWriter: error escribiendo {self.path}: {e}")
+        if closing is not None:
+            if self._handle:
+                self._handle.close()
+            self._writer._resolve(closing)
+
+
+class RunWriter:
+    """Escritor en segundo plano con lotes y coalescencia"""
+
+    def __init__(self, flush_interval: float = 0.2, max_buffer_bytes: int = 4 * 1024 * 1024):
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ops: Dict[Hashable, Tuple[Callable, tuple]] = {}
+        self._dirty: Dict[int, BufferedFile] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._stopping = False
+        self.batches = 0
+        self.ops_done = 0
+        self.ops_coalesced = 0
+
+        self._thread = threading.Thread(target=self._loop, name="run-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ========================================
+    # API (desde el event loop)
+    # ========================================
+
+    def call(self, key: Hashable, fn: Callable, *args):
+        """Ejecuta fn(*args) en el hilo; una llamada pendiente con la misma clave se reemplaza"""
+        with self._lock:
+            if key in self._ops:
+                self.ops_coalesced += 1
+            self._ops[key] = (fn, args)
+        self._wake.set()
+
+    def write_json(self, path: Path, data, indent: int = None):
+        """Serializa y escribe JSON de forma atómica (compacto por defecto)"""
+        path = Path(path)
+        self.call(("json", path), self._write_json, path, data, indent)
+
+    def open(self, path: Path, binary: bool = False) -> BufferedFile:
+        """Archivo de escritura en segundo plano (se trunca al primer volcado)"""
+        file = BufferedFile(self, path, binary)
+        with self._lock:
+            self._dirty[id(file)] = file
+        return file
+
+    async def flush(self):
+        """Espera a que todo lo encolado hasta ahora esté escrito"""
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._waiters.append(future)
+        self._wake.set()
+        await future
+
+    def close(self):
+        """Vuelca lo pendiente y detiene el hilo (también al salir del proceso)"""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=10)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._ops) + len(self._dirty)
+        return {
+            "pending": pending,
+            "batches": self.batches,
+            "ops_done": self.ops_done,
+            "ops_coalesced": self.ops_coalesced
+        }
+
+    # ========================================
+    # Hilo escritor
+    # ========================================
+
+    @staticmethod
+    def _write_json(path: Path, data, indent: Optional[int]):
+        separators = None if indent else (",", ":")
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, indent=indent, separators=separators, ensure_ascii=False))
+        os.replace(tmp, path)
+
+    def _resolve(self, future: asyncio.Future):
+        def set_done():
+            if not future.done():
+                future.set_result(None)
+        try:
+            future.get_loop().call_soon_threadsafe(set_done)
+        except RuntimeError:
+            pass  # El loop ya se cerró
+
+    def _loop(self):
+        while True:
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            stopping = self._stopping
+
+            with self._lock:
+                ops, self._ops = self._ops, {}
+                files = list(self._dirty.values())
+                self._dirty = {}
+                waiters, self._waiters = self._waiters, []
+
+            if ops or files:
+                started = time.time()
+                for file in files:
+                    file._drain()
+                for fn, args in ops.values():
+                    try:
+                        fn(*args)
+                    except Exception:
+                        logger.exception(f"RunWriter: error en {getattr(fn, '__name__', fn)}")
+                self.batches += 1
+                self.ops_done += len(ops)
+                elapsed = time.time() - started
+                if elapsed > 1:
+                    logger.warning(f"RunWriter: lote de {len(ops)} ops y {len(files)} archivos en {elapsed:.1f}s")
+
+            for future in waiters:
+                self._resolve(future)
+
+            if stopping:
+                with self._lock:
+                    idle = not self._ops and not self._dirty
+                if idle:
+                    return
@@ -88,6 +88,7 @@ class SchedulerService:
 
         # Callback cuando se ejecuta una tarea
         self.on_task_run: Optional[Callable[[ScheduledTask], None]] = None
+        self.on_event: Optional[Callable[[Dict], None]] = None  # Bus de eventos (UI)
 
         # Cargar config
         self._load_config()
@@ -167,6 +168,16 @@ class SchedulerService:
             logger.error(f"Error ejecutando tarea {task.name}: {e}")
             task.last_status = "error"
 
+        if self.on_event:
+            self.on_event({
+                "event": "task_run",
+                "task_id": task.id,
+                "name": task.name,
+                "status": task.last_status,
+                "run_count": task.run_count,
+                "timestamp": task.last_run
+            })
+
         self._save_config()
 
     def _schedule_task(self, task: ScheduledTask):
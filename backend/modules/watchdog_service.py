@@ -163,6 +163,7 @@ class WatchdogService:
 
         # Callbacks
         self.on_file_detected: Optional[Callable[[FileEvent], None]] = None
+        self.on_event: Optional[Callable[[Dict], None]] = None  # Bus de eventos (UI)
 
         # Cargar config guardada
         self._load_config()
@@ -279,6 +280,17 @@ class WatchdogService:
                 # Esperar evento con timeout para poder salir
                 event = self.event_queue.get(timeout=1.0)
 
+                if self.on_event:
+                    watch = self.watches.get(event.watch_id)
+                    self.on_event({
+                        "event": "file_detected",
+                        "path": event.path,
+                        "watch_id": event.watch_id,
+                        "watch_name": watch.name if watch else "",
+                        "event_type": event.event_type,
+                        "timestamp": event.timestamp
+                    })
+
                 if self.on_file_detected:
                     try:
                         self.on_file_detected(event)